@@ -1,77 +1,191 @@
 from google import genai
-from typing import List, Dict
-from utils.retry_utils import async_retry_with_backoff
+from typing import List, Dict, Optional
+import asyncio
+import heapq
+import logging
+import re
+from utils.retry_utils import async_retry_with_backoff, RateLimiter
+from utils.llm_cache import cached_generate, json_loads as _json_loads
 from config import Config
 
+logger = logging.getLogger("rarepath.agents.community")
+
+# Compiled once at import - grabs the JSON array out of a grounded response
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+
+# Static prompt body built once at import; only the condition name varies
+_COMMUNITY_PROMPT_TEMPLATE = """Find patient support communities and resources for people with {condition_name}.
+
+Look for:
+1. Official patient advocacy organizations (e.g., foundations, associations)
+2. Online support groups (Reddit, Facebook groups)
+3. Educational resources and websites
+4. Patient conferences or events
+5. Peer support networks
+
+Provide:
+- Organization/community name
+- Type (advocacy group, online forum, etc.)
+- URL (if available)
+- Brief description
+- Why it's helpful
+
+Return top 5 resources."""
+
+# Fused variant: one grounded call covers every condition (row-marshaling)
+_BATCH_COMMUNITY_PROMPT_TEMPLATE = """For EACH of the following conditions, find patient support communities and resources:
+{condition_list}
+
+Look for per condition:
+1. Official patient advocacy organizations (e.g., foundations, associations)
+2. Online support groups (Reddit, Facebook groups)
+3. Educational resources and websites
+4. Patient conferences or events
+5. Peer support networks
+
+For each resource provide the organization/community name, type, URL (if
+available), a brief description, and why it's helpful. List the top 5
+resources per condition.
+
+Return strictly a JSON array with one object per condition, in the same
+order as listed, with fields "condition" (the condition name) and
+"resources" (the formatted resource list as a single string). Output only
+the JSON array."""
+
 class CommunityConnectorAgent:
     """Agent that finds patient communities and support resources"""
-    
-    def __init__(self, client: genai.Client):
+
+    def __init__(self, client: genai.Client, rate_limiter: Optional[RateLimiter] = None):
         self.client = client
-    
+        self.rate_limiter = rate_limiter
+
     async def find_communities(self, conditions: List[Dict]) -> List[Dict]:
         """
         Find patient advocacy groups and support communities
-        
+
         Args:
             conditions: List of potential conditions
-            
+
         Returns:
             List of community resources
         """
-        
+
         if not conditions:
             return []
-        
+
+        # Get top 3 conditions - nlargest keeps a size-3 heap instead of
+        # sorting the whole list
+        top_conditions = heapq.nlargest(
+            3, conditions, key=lambda x: x.get('confidence', 0)
+        )
+
+        # One fused grounded call covers every condition - N round-trips
+        # collapse to 1, at the cost of a slightly larger prompt. Only
+        # worth it for 2+ conditions: the orchestrator's speculative
+        # tasks arrive with singleton lists, where the row-marshaling
+        # wrapper is pure overhead over the plain per-condition prompt
+        if len(top_conditions) > 1:
+            batched = await self._search_communities_batched(top_conditions)
+            if batched is not None:
+                return batched
+
+        # Fallback: search each condition concurrently - still I/O-bound
+        # on the LLM, so latency is ~1x a single call rather than 3x
+        tasks = [
+            self._search_condition_communities(condition.get('name', ''))
+            for condition in top_conditions
+        ]
+        responses = await asyncio.gather(*tasks, return_exceptions=True)
+
         communities = []
-        
-        # Get top 3 conditions
-        top_conditions = sorted(
-            conditions,
-            key=lambda x: x.get('confidence', 0),
-            reverse=True
-        )[:3]
-        
-        for condition in top_conditions:
+        for condition, response in zip(top_conditions, responses):
             condition_name = condition.get('name', '')
-            
-            # Search for communities
-            community_prompt = f"""Find patient support communities and resources for people with {condition_name}.
 
-Look for:
-1. Official patient advocacy organizations (e.g., foundations, associations)
-2. Online support groups (Reddit, Facebook groups)
-3. Educational resources and websites
-4. Patient conferences or events
-5. Peer support networks
+            if isinstance(response, Exception):
+                # Retries already exhausted inside _generate_communities -
+                # degrade to no resources for this condition
+                logger.error(f"Error finding communities for {condition_name}: {response}")
+                continue
 
-Provide:
-- Organization/community name
-- Type (advocacy group, online forum, etc.)
-- URL (if available)
-- Brief description
-- Why it's helpful
+            communities.append({
+                'condition': condition_name,
+                'resources': response
+            })
 
-Return top 5 resources."""
+        return communities
+
+    async def _search_communities_batched(self, top_conditions: List[Dict]) -> Optional[List[Dict]]:
+        """Run one fused community search over all conditions
+
+        Returns None when the call or the array parse fails, so the
+        caller can fall back to per-condition searches.
+        """
+
+        condition_names = [c.get('name', '') for c in top_conditions]
+        prompt = _BATCH_COMMUNITY_PROMPT_TEMPLATE.format(
+            condition_list="\n".join(f"- {name}" for name in condition_names)
+        )
+
+        try:
+            response = await self._generate_communities(prompt)
+            match = _JSON_ARRAY_RE.search(response)
+            if not match:
+                return None
+            entries = _json_loads(match.group())
+        except Exception:
+            logger.warning("Batched community search failed, falling back", exc_info=True)
+            return None
+
+        if not isinstance(entries, list):
+            return None
+
+        by_condition = {
+            entry.get('condition', ''): entry.get('resources', '')
+            for entry in entries if isinstance(entry, dict)
+        }
+        return [
+            {'condition': name, 'resources': by_condition.get(name, '')}
+            for name in condition_names
+            if by_condition.get(name)
+        ] or None
+
+    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES, pace=False)
+    async def _generate_communities(self, prompt: str) -> str:
+        """Dispatch a grounded community prompt under the shared limits
 
-            try:
-                response = await self.client.aio.models.generate_content(
-                    model=Config.MODEL_NAME,
-                    contents=community_prompt,
+        The decorator classifies and retries transient failures;
+        pace=False because each attempt already draws a token from the
+        injected shared limiter below.
+
+        Exact-match tier only: community prompts differ just in the
+        condition name, so a semantic hit would return another
+        condition's resources.
+        """
+
+        if self.rate_limiter:
+            async with self.rate_limiter:
+                return await cached_generate(
+                    self.client,
+                    Config.MODEL_NAME,
+                    prompt,
                     config={
                         'tools': [{'google_search': {}}]
-                    }
+                    },
+                    semantic=False
                 )
-                
-                community_data = {
-                    'condition': condition_name,
-                    'resources': response.text
-                }
-                
-                communities.append(community_data)
-                
-            except Exception as e:
-                print(f"Error finding communities for {condition_name}: {e}")
-                continue
-        
-        return communities
+
+        return await cached_generate(
+            self.client,
+            Config.MODEL_NAME,
+            prompt,
+            config={
+                'tools': [{'google_search': {}}]
+            },
+            semantic=False
+        )
+
+    async def _search_condition_communities(self, condition_name: str) -> str:
+        """Run the community search for a single condition"""
+
+        community_prompt = _COMMUNITY_PROMPT_TEMPLATE.format(condition_name=condition_name)
+        return await self._generate_communities(community_prompt)
@@ -1,12 +1,97 @@
 from google import genai
-from typing import Dict, List
-import json
-from utils.retry_utils import async_retry_with_backoff
+from typing import Dict, List, TypedDict
+import asyncio
+import logging
+from utils.retry_utils import async_retry_with_backoff, is_retryable_error
+from utils.llm_cache import (
+    cached_generate, get_llm_semaphore, PromptKVCache,
+    json_loads as _json_loads, json_dumps as _json_dumps
+)
 from config import Config
 
+logger = logging.getLogger("rarepath.agents.history")
+
+
+def _slim_condition(condition: Dict) -> Dict:
+    """Keep only the fields the analysis prompt needs - long evidence
+    strings and test lists just inflate input tokens (and latency)"""
+    return {
+        'name': condition.get('name', ''),
+        'confidence': round(condition.get('confidence', 0), 2),
+        'matching_symptoms': condition.get('matching_symptoms', [])[:5]
+    }
+
+
+# Static prompt bodies built once at import; only patient data varies
+_SUMMARY_PROMPT_TEMPLATE = """Create a concise executive summary (2-3 sentences) of this patient's case:
+
+Primary Symptoms: {primary_symptoms}
+Timeline: {timeline}
+Severity: {severity}
+Family History: {family_history}
+
+Write in clear, compassionate language suitable for both the patient and their doctors."""
+
+_ANALYSIS_PROMPT_TEMPLATE = """Analyze these potential rare disease diagnoses in the context of the patient's symptoms.
+
+Patient Symptoms: {primary_symptoms}
+
+Potential Conditions:
+{conditions_json}
+
+For each condition, provide:
+1. Why this diagnosis fits the patient's presentation
+2. Key diagnostic tests needed to confirm/rule out
+3. Confidence score (0.0-1.0)
+4. Which of the patient's symptoms match this condition
+5. What additional symptoms would increase confidence
+
+Return as JSON array of analyzed conditions."""
+
+_NEXT_STEPS_PROMPT_TEMPLATE = """Based on these potential diagnoses and symptoms, generate 5-7 actionable next steps for the patient.
+
+Potential Diagnoses: {condition_names}
+Symptoms: {primary_symptoms}
+
+Steps should be:
+- Specific and actionable
+- Prioritized by urgency
+- Practical for a patient to accomplish
+- Include both medical and self-care actions
+
+Return as JSON array of strings."""
+
+_QUESTIONS_PROMPT_TEMPLATE = """Generate 5 important questions a patient should ask their doctor about these potential diagnoses:
+{condition_names}
+
+Questions should:
+- Help confirm or rule out diagnoses
+- Address treatment options
+- Clarify next diagnostic steps
+- Be clear and direct
+
+Return as JSON array of strings."""
+
+
+class ConditionAnalysis(TypedDict):
+    """Response schema for condition analysis - forces valid JSON output
+
+    Field names mirror what the report consumers (display_report, the
+    Streamlit diagnoses panel) read off potential_diagnoses entries.
+    """
+    name: str
+    fit_rationale: str
+    diagnostic_tests: List[str]
+    confidence: float
+    matching_symptoms: List[str]
+    additional_symptoms: List[str]
+
 class HistoryCompilerAgent:
     """Agent that compiles comprehensive medical reports"""
-    
+
+    # Shared on-disk cache for prompts with highly repetitive inputs
+    _prompt_cache = PromptKVCache()
+
     def __init__(self, client: genai.Client):
         self.client = client
     
@@ -30,21 +115,30 @@ class HistoryCompilerAgent:
             Comprehensive diagnostic report
         """
         
-        # Generate patient summary
-        patient_summary = await self._generate_patient_summary(symptoms)
-        
-        # Generate condition analysis
-        condition_analysis = await self._analyze_conditions(conditions, symptoms)
-        
-        # Generate specialist recommendations
+        # The patient summary and condition analysis are independent, so run
+        # them concurrently; next steps and doctor questions both need the
+        # condition analysis, so they start as soon as it resolves
+        summary_task = asyncio.create_task(self._generate_patient_summary(symptoms))
+        analysis_task = asyncio.create_task(self._analyze_conditions(conditions, symptoms))
+
+        # Generate specialist recommendations (sync formatting)
         specialist_recommendations = self._format_specialists(specialists)
-        
-        # Generate clinical trial summary
+
+        # Generate clinical trial summary (sync formatting)
         trial_summary = self._format_trials(trials)
-        
-        # Generate next steps
-        next_steps = await self._generate_next_steps(condition_analysis, symptoms)
-        
+
+        condition_analysis = await analysis_task
+
+        # Fire the dependent calls together alongside the summary
+        next_steps_task = asyncio.create_task(self._generate_next_steps(condition_analysis, symptoms))
+        questions_task = asyncio.create_task(self._generate_doctor_questions(condition_analysis))
+
+        patient_summary, next_steps, doctor_questions = await asyncio.gather(
+            summary_task,
+            next_steps_task,
+            questions_task
+        )
+
         # Compile final report
         report = {
             'executive_summary': patient_summary,
@@ -54,32 +148,47 @@ class HistoryCompilerAgent:
             'clinical_trials': trial_summary,
             'next_steps': next_steps,
             'timeline_visualization': self._create_timeline(symptoms),
-            'questions_for_doctor': await self._generate_doctor_questions(condition_analysis),
+            'questions_for_doctor': doctor_questions,
             'disclaimer': self._get_disclaimer()
         }
-        
+
         return report
     
     @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
     async def _generate_patient_summary(self, symptoms: Dict) -> str:
         """Generate executive summary of patient case"""
         
-        prompt = f"""Create a concise executive summary (2-3 sentences) of this patient's case:
+        prompt = _SUMMARY_PROMPT_TEMPLATE.format(
+            primary_symptoms=symptoms.get('primary_symptoms', []),
+            timeline=symptoms.get('timeline', ''),
+            severity=symptoms.get('severity', ''),
+            family_history=symptoms.get('family_history', '')
+        )
 
-Primary Symptoms: {symptoms.get('primary_symptoms', [])}
-Timeline: {symptoms.get('timeline', '')}
-Severity: {symptoms.get('severity', '')}
-Family History: {symptoms.get('family_history', '')}
+        try:
+            # Stream and stop after 3 sentences - the summary only needs
+            # 2-3, so a long-winded response never costs full latency.
+            # Held under the shared semaphore: the request stays in
+            # flight until the stream is abandoned
+            async with get_llm_semaphore():
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=Config.MODEL_NAME,
+                    contents=prompt
+                )
 
-Write in clear, compassionate language suitable for both the patient and their doctors."""
+                buffer = ""
+                async for chunk in stream:
+                    if not chunk.text:
+                        continue
+                    buffer += chunk.text
+                    if buffer.count('.') >= 3:
+                        break
 
-        try:
-            response = await self.client.aio.models.generate_content(
-                model=Config.MODEL_NAME,
-                contents=prompt
-            )
-            return response.text.strip()
-        except:
+            return buffer.strip()
+        except Exception as e:
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error generating patient summary")
             return "Patient presents with multiple chronic symptoms requiring specialist evaluation."
     
     @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
@@ -89,47 +198,28 @@ Write in clear, compassionate language suitable for both the patient and their d
         if not conditions:
             return []
         
-        analysis_prompt = f"""Analyze these potential rare disease diagnoses in the context of the patient's symptoms.
-
-Patient Symptoms: {symptoms.get('primary_symptoms', [])}
-
-Potential Conditions:
-{json.dumps(conditions[:5], indent=2)}
-
-For each condition, provide:
-1. Why this diagnosis fits the patient's presentation
-2. Key diagnostic tests needed to confirm/rule out
-3. Confidence level (High/Medium/Low)
-4. What additional symptoms would increase confidence
-
-Return as JSON array of analyzed conditions."""
+        analysis_prompt = _ANALYSIS_PROMPT_TEMPLATE.format(
+            primary_symptoms=symptoms.get('primary_symptoms', []),
+            conditions_json=_json_dumps([_slim_condition(c) for c in conditions[:5]])
+        )
 
         try:
-            response = await self.client.aio.models.generate_content(
-                model=Config.MODEL_NAME,
-                contents=analysis_prompt
+            response_text = await cached_generate(
+                self.client, Config.MODEL_NAME, analysis_prompt,
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': list[ConditionAnalysis]
+                }
             )
-            
-            # Parse and return analyzed conditions
-            return self._parse_condition_analysis(response.text, conditions)
-            
+
+            return _json_loads(response_text)
+
         except Exception as e:
-            print(f"Error analyzing conditions: {e}")
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error analyzing conditions")
             return conditions  # Return original if analysis fails
-    
-    def _parse_condition_analysis(self, response: str, original_conditions: List[Dict]) -> List[Dict]:
-        """Parse condition analysis from LLM"""
-        import re
-        
-        try:
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-        except:
-            pass
-        
-        return original_conditions
-    
+
     def _format_specialists(self, specialists: List[Dict]) -> List[Dict]:
         """Format specialist recommendations"""
         formatted = []
@@ -161,29 +251,39 @@ Return as JSON array of analyzed conditions."""
     @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
     async def _generate_next_steps(self, conditions: List[Dict], symptoms: Dict) -> List[str]:
         """Generate actionable next steps for patient"""
-        
-        prompt = f"""Based on these potential diagnoses and symptoms, generate 5-7 actionable next steps for the patient.
 
-Potential Diagnoses: {[c.get('name', '') for c in conditions[:3]]}
-Symptoms: {symptoms.get('primary_symptoms', [])}
+        condition_names = [c.get('name', '') for c in conditions[:3]]
 
-Steps should be:
-- Specific and actionable
-- Prioritized by urgency
-- Practical for a patient to accomplish
-- Include both medical and self-care actions
+        # Exact-match cache: identical condition/symptom combos are common
+        cache_key = self._prompt_cache.make_key(
+            sorted(symptoms.get('primary_symptoms', [])), condition_names
+        )
+        cached = self._prompt_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-Return as JSON array of strings."""
+        prompt = _NEXT_STEPS_PROMPT_TEMPLATE.format(
+            condition_names=condition_names,
+            primary_symptoms=symptoms.get('primary_symptoms', [])
+        )
 
         try:
-            response = await self.client.aio.models.generate_content(
-                model=Config.MODEL_NAME,
-                contents=prompt
+            response_text = await cached_generate(
+                self.client, Config.MODEL_NAME, prompt,
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': list[str]
+                }
             )
-            
-            return self._parse_next_steps(response.text)
-            
-        except:
+
+            next_steps = _json_loads(response_text)
+            self._prompt_cache.set(cache_key, next_steps)
+            return next_steps
+
+        except Exception as e:
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error generating next steps")
             return [
                 "Schedule appointment with primary care physician to discuss findings",
                 "Request referrals to recommended specialists",
@@ -191,27 +291,7 @@ Return as JSON array of strings."""
                 "Gather all previous medical records and test results",
                 "Research patient advocacy groups for support"
             ]
-    
-    def _parse_next_steps(self, response: str) -> List[str]:
-        """Parse next steps from LLM response"""
-        import re
-        
-        try:
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-        except:
-            pass
-        
-        # Fallback: parse bullet points
-        steps = []
-        for line in response.split('\n'):
-            line = line.strip()
-            if line and (line.startswith('-') or line.startswith('•') or line[0].isdigit()):
-                steps.append(line.lstrip('-•0123456789. '))
-        
-        return steps if steps else ["Consult with your healthcare provider"]
-    
+
     def _create_timeline(self, symptoms: Dict) -> Dict:
         """Create a visual timeline of symptom progression"""
         return {
@@ -231,27 +311,34 @@ Return as JSON array of strings."""
         """Generate questions for patient to ask their doctor"""
         
         condition_names = [c.get('name', '') for c in conditions[:3]]
-        
-        prompt = f"""Generate 5 important questions a patient should ask their doctor about these potential diagnoses:
-{', '.join(condition_names)}
 
-Questions should:
-- Help confirm or rule out diagnoses
-- Address treatment options
-- Clarify next diagnostic steps
-- Be clear and direct
+        # Exact-match cache: the same top-3 conditions recur across patients
+        cache_key = self._prompt_cache.make_key(condition_names)
+        cached = self._prompt_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-Return as JSON array of strings."""
+        prompt = _QUESTIONS_PROMPT_TEMPLATE.format(
+            condition_names=', '.join(condition_names)
+        )
 
         try:
-            response = await self.client.aio.models.generate_content(
-                model=Config.MODEL_NAME,
-                contents=prompt
+            response_text = await cached_generate(
+                self.client, Config.MODEL_NAME, prompt,
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': list[str]
+                }
             )
+
+            questions = _json_loads(response_text)
+            self._prompt_cache.set(cache_key, questions)
+            return questions
             
-            return self._parse_next_steps(response.text)  # Same parsing logic
-            
-        except:
+        except Exception as e:
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error generating doctor questions")
             return [
                 "What tests can help confirm or rule out these conditions?",
                 "Should I see a specialist, and if so, what type?",
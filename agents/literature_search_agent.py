@@ -1,31 +1,91 @@
 from google import genai
-from typing import List, Dict
-import sys
-sys.path.append('..')
+from typing import List, Dict, TypedDict
+import asyncio
+import hashlib
+import logging
 from tools.pubmed_tool import PubMedTool
 from utils.retry_utils import async_retry_with_backoff
+from utils.llm_cache import (
+    cached_generate, get_llm_semaphore, topk_cosine, EMBEDDING_MODEL,
+    json_loads as _json_loads
+)
 from config import Config
 
+logger = logging.getLogger("rarepath.agents.literature")
+
+# Only the most symptom-relevant articles are worth LLM tokens
+TOP_ARTICLES_FOR_ANALYSIS = 5
+
+
+class Condition(TypedDict):
+    """Response schema for condition extraction - forces valid JSON output"""
+    name: str
+    confidence: float
+    matching_symptoms: List[str]
+    diagnostic_tests: List[str]
+    evidence: str
+
+
 class LiteratureSearchAgent:
     """Agent that searches medical literature for matching conditions"""
     
     def __init__(self, client: genai.Client, pubmed_tool: PubMedTool):
         self.client = client
         self.pubmed_tool = pubmed_tool
+        self._embedding_cache = {}  # PMID -> embedding vector
     
     @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
     async def search_conditions(self, symptoms: Dict) -> List[Dict]:
         """
         Search medical literature for conditions matching symptoms
-        
+
         Args:
             symptoms: Structured symptom data from SymptomAggregator
-            
+
         Returns:
             List of potential conditions with evidence
         """
-        
-        # Step 1: Generate search queries using Gemini
+
+        try:
+            all_articles = await self._collect_articles(symptoms)
+
+            # Analyze articles to extract conditions
+            conditions = await self._analyze_articles(all_articles, symptoms)
+            logger.debug(f"Extracted {len(conditions)} conditions from articles")
+
+            return conditions
+
+        except Exception as e:
+            logger.error(f"Error in literature search: {e}", exc_info=True)
+            return []
+
+    async def stream_conditions(self, symptoms: Dict):
+        """
+        Stream conditions as they are extracted from the literature
+
+        Yields each condition the moment its JSON object completes in the
+        model's streamed output, so downstream agents can launch
+        speculatively instead of waiting for the full list.
+        """
+
+        all_articles = await self._collect_articles(symptoms)
+        all_articles = await self._rank_articles_by_relevance(all_articles, symptoms)
+
+        count = 0
+        async for condition in self._stream_analyzed_conditions(all_articles, symptoms):
+            count += 1
+            yield condition
+
+        logger.debug(f"Extracted {count} conditions from articles")
+
+    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
+    async def _generate_queries(self, symptoms: Dict) -> List[str]:
+        """Generate PubMed search queries with Gemini
+
+        Decorated so the streaming journey path gets the same pacing and
+        429 backoff as the non-streaming one.
+        """
+
         query_generation_prompt = f"""Based on these symptoms, generate 3-5 targeted PubMed search queries to find rare diseases that match:
 
 Symptoms: {symptoms.get('primary_symptoms', [])}
@@ -40,67 +100,109 @@ Generate queries that:
 
 Return as JSON array: ["query1", "query2", "query3"]"""
 
+        # JSON mode guarantees a parseable array
+        response_text = await cached_generate(
+            self.client, Config.MODEL_NAME, query_generation_prompt,
+            config={
+                'response_mime_type': 'application/json',
+                'response_schema': list[str]
+            }
+        )
+
+        return _json_loads(response_text)
+
+    async def _collect_articles(self, symptoms: Dict) -> List[Dict]:
+        """Generate PubMed queries and gather deduplicated articles"""
+
+        # Step 1: Generate search queries using Gemini (retried/paced)
+        queries = await self._generate_queries(symptoms)
+        logger.debug(f"Generated {len(queries)} search queries")
+        for i, q in enumerate(queries[:3], 1):
+            logger.debug(f"  {i}. {q[:80]}...")
+
+        # Step 2: Search PubMed for all queries at once - concurrent
+        # esearches share a single batched efetch (limit to 3 queries)
+        search_results = await self.pubmed_tool.search_many(queries[:3], 10)
+
+        all_articles = []
+        for query, articles in zip(queries[:3], search_results):
+            logger.debug(f"PubMed returned {len(articles)} articles for query: {query[:50]}...")
+            all_articles.extend(articles)
+
+        # Related queries return overlapping PMIDs - dedupe before any
+        # formatting/analysis work so duplicates never cost LLM tokens
+        all_articles = self._deduplicate_articles(all_articles)
+
+        logger.debug(f"Total unique articles collected: {len(all_articles)}")
+
+        return all_articles
+
+    @staticmethod
+    def _deduplicate_articles(articles: List[Dict]) -> List[Dict]:
+        """Drop duplicate articles, keyed on PMID (title hash if missing)"""
+        seen = {}
+        for article in articles:
+            key = article.get('pmid') or hashlib.md5(
+                article.get('title', '').lower().encode()
+            ).hexdigest()
+            seen.setdefault(key, article)
+        return list(seen.values())
+
+    async def _rank_articles_by_relevance(self, articles: List[Dict], symptoms: Dict) -> List[Dict]:
+        """
+        Pre-filter articles with local embeddings so only the most
+        symptom-relevant ones spend LLM tokens
+        """
+
+        if len(articles) <= TOP_ARTICLES_FOR_ANALYSIS:
+            return articles
+
         try:
-            # Generate search queries
-            response = await self.client.aio.models.generate_content(
-                model=Config.MODEL_NAME,
-                contents=query_generation_prompt
+            symptom_text = " ".join(symptoms.get('primary_symptoms', []))
+
+            # Embed only articles we haven't seen before (keyed on PMID)
+            to_embed = [symptom_text]
+            uncached = []
+            for article in articles:
+                if article.get('pmid', '') not in self._embedding_cache:
+                    to_embed.append(f"{article['title']} {article['abstract'][:500]}")
+                    uncached.append(article)
+
+            result = await self.client.aio.models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=to_embed
             )
-            
-            # Parse queries
-            queries = self._extract_queries(response.text)
-            print(f"  DEBUG: Generated {len(queries)} search queries")
-            for i, q in enumerate(queries[:3], 1):
-                print(f"    {i}. {q[:80]}...")
-            
-            # Step 2: Search PubMed with each query
-            all_articles = []
-            for query in queries[:3]:  # Limit to 3 queries
-                articles = self.pubmed_tool.search(query, max_results=10)
-                print(f"  DEBUG: PubMed returned {len(articles)} articles for query: {query[:50]}...")
-                all_articles.extend(articles)
-            
-            print(f"  DEBUG: Total articles collected: {len(all_articles)}")
-            
-            # Step 3: Analyze articles to extract conditions
-            conditions = await self._analyze_articles(all_articles, symptoms)
-            print(f"  DEBUG: Extracted {len(conditions)} conditions from articles")
-            
-            return conditions
-            
+            vectors = [e.values for e in result.embeddings]
+
+            symptom_vec = vectors[0]
+            for article, vec in zip(uncached, vectors[1:]):
+                self._embedding_cache[article.get('pmid', '')] = vec
+
+            # Batched top-K over all article vectors in one kernel call
+            candidates = [
+                (article, self._embedding_cache[article.get('pmid', '')])
+                for article in articles
+                if article.get('pmid', '') in self._embedding_cache
+            ]
+            top = topk_cosine(
+                symptom_vec,
+                [vec for _, vec in candidates],
+                TOP_ARTICLES_FOR_ANALYSIS
+            )
+            return [candidates[i][0] for i, _ in top]
+
         except Exception as e:
-            print(f"Error in literature search: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
-    
-    def _extract_queries(self, response: str) -> List[str]:
-        """Extract search queries from LLM response"""
-        import json
-        import re
-        
-        try:
-            # Try to parse JSON array
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-        except:
-            pass
-        
-        # Fallback: split by newlines
-        queries = [line.strip() for line in response.split('\n') if line.strip()]
-        return queries[:5]
-    
-    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
-    async def _analyze_articles(self, articles: List[Dict], symptoms: Dict) -> List[Dict]:
-        """Analyze articles to identify potential conditions"""
-        
-        analysis_prompt = f"""Analyze these medical research articles and identify rare diseases that match the patient's symptoms.
+            logger.debug(f"Embedding filter failed, keeping first {TOP_ARTICLES_FOR_ANALYSIS} articles ({e})")
+            return articles[:TOP_ARTICLES_FOR_ANALYSIS]
+
+    def _build_analysis_prompt(self, articles: List[Dict], symptoms: Dict) -> str:
+        """Build the condition-extraction prompt shared by both analysis paths"""
+        return f"""Analyze these medical research articles and identify rare diseases that match the patient's symptoms.
 
 Patient symptoms: {symptoms.get('primary_symptoms', [])}
 
 Articles:
-{self._format_articles_for_analysis(articles[:10])}
+{self._format_articles_for_analysis(articles)}
 
 For each potential rare disease, provide:
 1. Condition name
@@ -111,19 +213,112 @@ For each potential rare disease, provide:
 
 Return as JSON array of conditions."""
 
+    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
+    async def _open_analysis_stream(self, prompt: str):
+        """Open the streaming analysis call
+
+        The open is where rate-limit errors surface, so it carries the
+        retry/pacing decorator; consumption happens in the caller.
+        """
+        return await self.client.aio.models.generate_content_stream(
+            model=Config.MODEL_NAME,
+            contents=prompt,
+            config={
+                'response_mime_type': 'application/json',
+                'response_schema': list[Condition]
+            }
+        )
+
+    async def _stream_analyzed_conditions(self, articles: List[Dict], symptoms: Dict):
+        """
+        Stream the condition analysis, yielding each condition as soon as
+        its JSON object completes in the partial response
+        """
+
+        # Held under the shared semaphore for the lifetime of the stream -
+        # a streaming request is in flight until the last chunk arrives
+        async with get_llm_semaphore():
+            stream = await self._open_analysis_stream(
+                self._build_analysis_prompt(articles, symptoms)
+            )
+
+            buffer = ""
+            pos = 0
+            async for chunk in stream:
+                if not chunk.text:
+                    continue
+                buffer += chunk.text
+                conditions, pos = self._extract_complete_objects(buffer, pos)
+                for condition in conditions:
+                    yield condition
+
+    @staticmethod
+    def _extract_complete_objects(buffer: str, pos: int):
+        """
+        Scan buffer[pos:] for complete top-level JSON objects
+
+        Returns (parsed objects, new scan position). Partial trailing
+        objects stay in the buffer for the next chunk.
+        """
+        objects = []
+        depth = 0
+        in_string = False
+        escape = False
+        start = None
+
+        i = pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0 and start is not None:
+                    try:
+                        objects.append(_json_loads(buffer[start:i + 1]))
+                    except Exception:
+                        pass
+                    pos = i + 1
+                    start = None
+            i += 1
+
+        return objects, pos
+
+    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
+    async def _analyze_articles(self, articles: List[Dict], symptoms: Dict) -> List[Dict]:
+        """Analyze articles to identify potential conditions"""
+
+        # Keep only the top-K most relevant articles - token cost and LLM
+        # latency both scale with the number of abstracts in the prompt
+        articles = await self._rank_articles_by_relevance(articles, symptoms)
+
+        analysis_prompt = self._build_analysis_prompt(articles, symptoms)
+
         try:
-            response = await self.client.aio.models.generate_content(
-                model=Config.MODEL_NAME,
-                contents=analysis_prompt
+            response_text = await cached_generate(
+                self.client, Config.MODEL_NAME, analysis_prompt,
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': list[Condition]
+                }
             )
-            
-            # Parse conditions
-            conditions = self._parse_conditions(response.text)
-            
-            return conditions
-            
+
+            # The schema pins the field names, so no normalization needed
+            return _json_loads(response_text)
+
         except Exception as e:
-            print(f"Error analyzing articles: {e}")
+            logger.error(f"Error analyzing articles: {e}", exc_info=True)
             return []
     
     def _format_articles_for_analysis(self, articles: List[Dict]) -> str:
@@ -132,57 +327,3 @@ Return as JSON array of conditions."""
         for i, article in enumerate(articles[:5], 1):
             formatted.append(f"{i}. {article['title']}\n   Abstract: {article['abstract'][:200]}...")
         return "\n\n".join(formatted)
-    
-    def _parse_conditions(self, response: str) -> List[Dict]:
-        """Parse conditions from LLM response"""
-        import json
-        import re
-        
-        try:
-            # Try to parse JSON array
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                conditions = json.loads(json_match.group())
-                
-                # Normalize condition format
-                normalized = []
-                for cond in conditions:
-                    # Handle different field names
-                    condition_name = (
-                        cond.get('name') or 
-                        cond.get('condition') or 
-                        cond.get('condition_name') or
-                        cond.get('diagnosis') or
-                        'Unknown Condition'
-                    )
-                    
-                    normalized.append({
-                        'name': condition_name,
-                        'confidence': cond.get('confidence', cond.get('confidence_score', 0.5)),
-                        'matching_symptoms': cond.get('matching_symptoms', cond.get('symptoms', [])),
-                        'diagnostic_tests': cond.get('diagnostic_tests', cond.get('tests', [])),
-                        'evidence': cond.get('evidence', cond.get('supporting_evidence', ''))
-                    })
-                
-                return normalized
-        except Exception as e:
-            print(f"Error parsing conditions JSON: {e}")
-        
-        # Fallback: extract condition names from text
-        conditions = []
-        lines = response.split('\n')
-        for line in lines:
-            # Look for patterns like "1. Condition Name" or "- Condition Name"
-            match = re.match(r'[\d\-\•]\s*\.?\s*([A-Z][^:\n]{5,80})', line.strip())
-            if match:
-                condition_name = match.group(1).strip()
-                if any(keyword in condition_name.lower() for keyword in ['syndrome', 'disease', 'disorder', 'condition']):
-                    conditions.append({
-                        'name': condition_name,
-                        'confidence': 0.6,
-                        'matching_symptoms': [],
-                        'diagnostic_tests': [],
-                        'evidence': ''
-                    })
-        
-        return conditions[:5]  # Return top 5
@@ -9,10 +9,15 @@ from agents.history_compiler import HistoryCompilerAgent
 from agents.community_connector import CommunityConnectorAgent
 from tools.pubmed_tool import PubMedTool
 from tools.clinical_trials_tool import ClinicalTrialsTool
+from tools import http_client
 from utils.memory import SessionManager, MemoryBank
+from utils import memory
 from utils.logger import RarePathLogger
-from utils.retry_utils import RateLimiter
-from config import Config
+from utils.retry_utils import get_default_limiter
+from utils.gemini_batch import GeminiBatcher
+from utils.llm_cache import PromptKVCache
+from utils import llm_cache
+from config import Config, get_client
 
 class RarePathOrchestrator:
     """
@@ -21,27 +26,36 @@ class RarePathOrchestrator:
     """
     
     def __init__(self, api_key: str):
-        # Initialize Gemini client
-        self.client = genai.Client(api_key=api_key)
+        # Shared Gemini client - reused across orchestrator instances so
+        # the HTTP/2 pool and TLS session survive reconstruction
+        self.client = get_client(api_key)
         
-        # Initialize tools
-        self.pubmed_tool = PubMedTool()
+        # Initialize tools (both share the pooled client in tools.http_client)
+        self.pubmed_tool = PubMedTool(api_key=Config.NCBI_API_KEY)
         self.trials_tool = ClinicalTrialsTool()
         
+        # Shared rate limiter to prevent quota exhaustion - the same
+        # bucket paces the retry decorator, so there is one call budget
+        self.rate_limiter = get_default_limiter()
+
+        # Micro-batch concurrent LLM prompts into shared dispatches
+        self.batcher = GeminiBatcher(self.client, model=Config.MODEL_NAME)
+        llm_cache.configure_batcher(self.batcher)
+
         # Initialize ALL agents
         self.symptom_agent = SymptomAggregatorAgent(self.client)
         self.literature_agent = LiteratureSearchAgent(self.client, self.pubmed_tool)
         self.specialist_agent = SpecialistFinderAgent(self.client)
         self.history_agent = HistoryCompilerAgent(self.client)
-        self.community_agent = CommunityConnectorAgent(self.client)
-        
+        self.community_agent = CommunityConnectorAgent(self.client, rate_limiter=self.rate_limiter)
+
         # Initialize memory and logging
         self.session_manager = SessionManager()
         self.memory_bank = MemoryBank()
         self.logger = RarePathLogger()
-        
-        # Initialize rate limiter to prevent quota exhaustion
-        self.rate_limiter = RateLimiter(calls_per_minute=Config.RATE_LIMIT_CALLS_PER_MINUTE)
+
+        # Whole-journey results persisted on disk, keyed on symptom profile
+        self.journey_cache = PromptKVCache('rarepath_journey_cache')
     
     async def run_diagnostic_journey(
         self, 
@@ -52,16 +66,44 @@ class RarePathOrchestrator:
         """
         Complete diagnostic journey with all agents
         """
+
+        report = None
+        async for stage, payload in self.stream_diagnostic_journey(
+            patient_input, session_id, patient_location
+        ):
+            if stage == 'report':
+                report = payload
+        return report
+
+    async def stream_diagnostic_journey(
+        self,
+        patient_input: str,
+        session_id: str = "default",
+        patient_location: str = "United States"
+    ):
+        """
+        Run the diagnostic journey, yielding (stage, payload) tuples as
+        each stage completes: 'symptoms', 'conditions', 'trials',
+        'specialists', 'communities', then 'report' with the final report.
+
+        Lets callers (e.g. the Streamlit UI) render partial results while
+        later stages are still running instead of blocking on the whole
+        journey.
+        """
         
         start_time = time.time()
         
-        print("🏥 RarePath AI - Starting comprehensive diagnostic journey...")
-        print("=" * 60)
+        self.logger.info("🏥 RarePath AI - Starting comprehensive diagnostic journey...")
+        self.logger.info("=" * 60)
         
         # Create session
         self.session_manager.create_session(session_id)
         self.logger.log_agent_call("Orchestrator", "start_journey")
         
+        # Every task created during the journey, so the failure path can
+        # cancel whatever is still in flight
+        background_tasks: List[asyncio.Task] = []
+
         # Track warnings for failed API calls
         warnings = {
             'conditions_failed': False,
@@ -72,88 +114,129 @@ class RarePathOrchestrator:
         
         try:
             # STEP 1: Symptom Collection (Sequential)
-            print("\n📋 Step 1: Collecting symptom information...")
+            self.logger.info("📋 Step 1: Collecting symptom information...")
             self.logger.log_agent_call("SymptomAggregator", "collect")
             
             await self.rate_limiter.acquire()  # Rate limit
             symptoms = await self.symptom_agent.collect_symptoms(patient_input, session_id)
             self.memory_bank.store_session(session_id, {'symptoms': symptoms})
             
-            print(f"✓ Identified {len(symptoms.get('primary_symptoms', []))} primary symptoms")
-            
+            self.logger.info(f"✓ Identified {len(symptoms.get('primary_symptoms', []))} primary symptoms")
+
+            yield 'symptoms', symptoms
+
+            # Whole-journey cache: a repeat symptom profile short-circuits
+            # Steps 2-5 entirely (same conditions, specialists, communities)
+            journey_key = self.journey_cache.make_key(
+                sorted(symptoms.get('primary_symptoms', [])),
+                symptoms.get('severity', ''),
+                symptoms.get('timeline', ''),
+                patient_location
+            )
+            cached_journey = self.journey_cache.get(journey_key)
+            if cached_journey and time.time() - cached_journey['stored_at'] < Config.JOURNEY_CACHE_TTL_SECONDS:
+                self.logger.info("✓ Reusing cached diagnostic journey for this symptom profile")
+                yield 'report', cached_journey['report']
+                return
+
             # STEP 2: Parallel Search Phase
-            print("\n🔍 Step 2: Running parallel searches...")
-            print("  → Searching medical literature...")
-            print("  → Finding specialists...")
-            print("  → Matching clinical trials...")
-            print("  → Connecting communities...")
+            self.logger.info("🔍 Step 2: Running parallel searches...")
+            self.logger.info("  → Searching medical literature...")
+            self.logger.info("  → Finding specialists...")
+            self.logger.info("  → Matching clinical trials...")
+            self.logger.info("  → Connecting communities...")
             
             self.logger.log_agent_call("ParallelSearch", "start")
-            
+
             # Rate limit before parallel search
             await self.rate_limiter.acquire()
-            
-            # Run all search agents in parallel
+
+            # Trials only need symptoms, so they start right away
+            trials_task = asyncio.create_task(self._search_clinical_trials(symptoms))
+            background_tasks.append(trials_task)
+
+            # STEP 3+4: Find specialists and communities (depend on conditions)
+            self.logger.info("👨‍⚕️ Step 3: Finding specialists...")
+            self.logger.log_agent_call("SpecialistFinder", "find")
+            self.logger.info("🤝 Step 4: Connecting with patient communities...")
+            self.logger.log_agent_call("CommunityConnector", "find")
+
+            # Stream conditions out of the literature search and launch
+            # specialist/community lookups speculatively for the first three,
+            # hiding the tail of the literature-analysis latency
+            literature_results = []
+            spec_tasks = []
+            comm_tasks = []
+            try:
+                async for condition in self.literature_agent.stream_conditions(symptoms):
+                    literature_results.append(condition)
+                    if len(literature_results) <= 3:
+                        spec_task = asyncio.create_task(
+                            self.specialist_agent.find_specialists([condition], patient_location)
+                        )
+                        comm_task = asyncio.create_task(
+                            self.community_agent.find_communities([condition])
+                        )
+                        spec_tasks.append(spec_task)
+                        comm_tasks.append(comm_task)
+                        background_tasks.extend([spec_task, comm_task])
+            except Exception as e:
+                self.logger.log_error(e, "literature_search")
+                self.logger.warning(f"⚠️  Literature search encountered an error: {type(e).__name__}: {str(e)[:200]}")
+                warnings['conditions_failed'] = True
+
+            self.logger.info(f"✓ Found {len(literature_results)} potential conditions")
+
+            yield 'conditions', literature_results
+
             results = await asyncio.gather(
-                self.literature_agent.search_conditions(symptoms),
-                self._search_clinical_trials(symptoms),
+                trials_task,
+                *spec_tasks,
+                *comm_tasks,
                 return_exceptions=True
             )
-            
-            literature_results = results[0] if not isinstance(results[0], Exception) else []
-            trial_results = results[1] if not isinstance(results[1], Exception) else []
-            
-            if isinstance(results[0], Exception):
-                print(f"⚠️  Literature search encountered an error: {type(results[0]).__name__}: {str(results[0][:200])}")
-                import traceback
-                traceback.print_exception(type(results[0]), results[0], results[0].__traceback__)
-                warnings['conditions_failed'] = True
-            if isinstance(results[1], Exception):
-                print(f"⚠️  Clinical trials search encountered an error: {type(results[1]).__name__}: {str(results[1])[:200]}")
-                import traceback
-                traceback.print_exception(type(results[1]), results[1], results[1].__traceback__)
+            trial_results = results[0]
+            spec_results = results[1:1 + len(spec_tasks)]
+            comm_results = results[1 + len(spec_tasks):]
+
+            if isinstance(trial_results, Exception):
+                self.logger.log_error(trial_results, "clinical_trials_search")
+                self.logger.warning(f"⚠️  Clinical trials search encountered an error: {type(trial_results).__name__}: {str(trial_results)[:200]}")
+                trial_results = []
                 warnings['trials_failed'] = True
-            
+
+            specialists = []
+            for result in spec_results:
+                if isinstance(result, Exception):
+                    self.logger.warning(f"⚠️  Specialist search failed: {str(result)[:100]}")
+                    warnings['specialists_failed'] = True
+                else:
+                    specialists.extend(result)
+
+            communities = []
+            for result in comm_results:
+                if isinstance(result, Exception):
+                    self.logger.warning(f"⚠️  Community search failed: {str(result)[:100]}")
+                    warnings['communities_failed'] = True
+                else:
+                    communities.extend(result)
+
             # Store in memory
             self.memory_bank.store_session(session_id, {
                 'conditions': literature_results,
                 'trials': trial_results
             })
-            
-            print(f"✓ Found {len(literature_results)} potential conditions")
-            print(f"✓ Found {len(trial_results)} relevant clinical trials")
-            
-            # STEP 3: Find specialists (depends on conditions)
-            print("\n👨‍⚕️ Step 3: Finding specialists...")
-            self.logger.log_agent_call("SpecialistFinder", "find")
-            
-            await self.rate_limiter.acquire()  # Rate limit
-            try:
-                specialists = await self.specialist_agent.find_specialists(
-                    literature_results,
-                    patient_location
-                )
-                print(f"✓ Found {len(specialists)} specialist recommendations")
-            except Exception as e:
-                print(f"⚠️  Specialist search failed: {str(e)[:100]}")
-                specialists = []
-                warnings['specialists_failed'] = True
-            
-            # STEP 4: Find communities
-            print("\n🤝 Step 4: Connecting with patient communities...")
-            self.logger.log_agent_call("CommunityConnector", "find")
-            
-            await self.rate_limiter.acquire()  # Rate limit
-            try:
-                communities = await self.community_agent.find_communities(literature_results)
-                print(f"✓ Found {len(communities)} community resources")
-            except Exception as e:
-                print(f"⚠️  Community search failed: {str(e)[:100]}")
-                communities = []
-                warnings['communities_failed'] = True
-            
+
+            self.logger.info(f"✓ Found {len(trial_results)} relevant clinical trials")
+            self.logger.info(f"✓ Found {len(specialists)} specialist recommendations")
+            self.logger.info(f"✓ Found {len(communities)} community resources")
+
+            yield 'trials', trial_results
+            yield 'specialists', specialists
+            yield 'communities', communities
+
             # STEP 5: Compile comprehensive report
-            print("\n📊 Step 5: Compiling comprehensive report...")
+            self.logger.info("📊 Step 5: Compiling comprehensive report...")
             self.logger.log_agent_call("HistoryCompiler", "compile")
             
             await self.rate_limiter.acquire()  # Rate limit
@@ -182,30 +265,64 @@ class RarePathOrchestrator:
                 'api_calls': self.logger.get_metrics()
             }
             
-            print("\n✓ Diagnostic journey complete!")
-            print(f"  Total time: {total_time:.2f} seconds")
-            print("=" * 60)
+            self.logger.info("✓ Diagnostic journey complete!")
+            self.logger.info(f"  Total time: {total_time:.2f} seconds")
+            self.logger.info("=" * 60)
             
             # Print metrics summary
             self.logger.print_summary()
-            
-            return report
-            
+
+            # Don't cache journeys where a stage failed - a retry should
+            # get a chance to produce the missing sections
+            if not any(warnings.values()):
+                self.journey_cache.set(journey_key, {
+                    'stored_at': time.time(),
+                    'report': report
+                })
+
+            yield 'report', report
+
         except Exception as e:
+            # Tear down in-flight agent tasks so a failed journey doesn't
+            # leave orphan requests burning quota and pooled connections
+            pending = [t for t in background_tasks if not t.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
             self.logger.log_error(e, "diagnostic_journey")
-            print(f"\n❌ Error during diagnostic journey: {str(e)}")
-            print("\n💡 Troubleshooting tips:")
-            print("  • Check your internet connection")
-            print("  • Verify your Gemini API key is valid and has quota remaining")
-            print("  • Visit https://ai.google.dev/gemini-api/docs/rate-limits for rate limit info")
-            print("  • Consider waiting a few minutes if you hit rate limits")
+            self.logger.warning(f"❌ Error during diagnostic journey: {str(e)}")
+            self.logger.info("💡 Troubleshooting tips:")
+            self.logger.info("  • Check your internet connection")
+            self.logger.info("  • Verify your Gemini API key is valid and has quota remaining")
+            self.logger.info("  • Visit https://ai.google.dev/gemini-api/docs/rate-limits for rate limit info")
+            self.logger.info("  • Consider waiting a few minutes if you hit rate limits")
             raise
     
+    async def warmup(self):
+        """Prime the Gemini connection (TCP+TLS setup) with a cheap call
+
+        Run once at startup so the first real diagnostic request doesn't
+        pay the handshake latency.
+        """
+        try:
+            await self.client.aio.models.list()
+        except Exception as e:
+            self.logger.debug(f"Warmup call failed (non-fatal): {e}")
+
+    async def aclose(self):
+        """Release pooled HTTP connections on shutdown"""
+        await self.pubmed_tool.aclose()
+        await self.trials_tool.aclose()
+        await http_client.aclose()
+        await memory.aclose()
+
     async def _search_clinical_trials(self, symptoms: Dict) -> List[Dict]:
         """Search for clinical trials"""
         primary_symptoms = symptoms.get('primary_symptoms', [])
         if not primary_symptoms:
             return []
         
-        trials = self.trials_tool.search(primary_symptoms[0], max_results=5)
+        trials = await self.trials_tool.search(primary_symptoms[0], max_results=5)
         return trials
@@ -1,9 +1,30 @@
-import requests
-from typing import List, Dict
+from typing import List, Dict, TypedDict
+import asyncio
+import hashlib
+import heapq
+import logging
 from google import genai
-from utils.retry_utils import async_retry_with_backoff
+from utils.retry_utils import async_retry_with_backoff, is_retryable_error
+from utils.llm_cache import cached_generate, json_loads as _json_loads
 from config import Config
 
+logger = logging.getLogger("rarepath.agents.specialist")
+
+
+class SpecialtyInfo(TypedDict):
+    """Response schema for one condition's specialty strategy"""
+    condition: str
+    primary_specialty: str
+    secondary_specialties: List[str]
+    key_qualifications: List[str]
+    search_terms: List[str]
+
+
+class SpecialtyResults(TypedDict):
+    """Top-level response schema for the fused specialty lookup"""
+    results: List[SpecialtyInfo]
+
+
 class GoogleSearchTool:
     """Tool for web search using Gemini's built-in Google Search"""
     
@@ -37,7 +58,9 @@ class GoogleSearchTool:
             return results
             
         except Exception as e:
-            print(f"Error in Google search: {e}")
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error in Google search")
             return []
     
     def _parse_search_results(self, response_text: str) -> List[Dict]:
@@ -46,15 +69,6 @@ class GoogleSearchTool:
         # In production, parse structured results
         return [{'content': response_text}]
 
-# ----------------------------------------------------------------------------
-# FILE 12: agents/specialist_finder.py
-# ----------------------------------------------------------------------------
-
-from google import genai
-from typing import List, Dict
-import sys
-sys.path.append('..')
-
 class SpecialistFinderAgent:
     """Agent that finds medical specialists for suspected conditions"""
     
@@ -80,78 +94,119 @@ class SpecialistFinderAgent:
         if not conditions:
             return []
         
-        # Get top 3 most likely conditions
-        top_conditions = sorted(
-            conditions, 
-            key=lambda x: x.get('confidence', 0), 
-            reverse=True
-        )[:3]
+        # Get top 3 most likely conditions - nlargest keeps a size-3 heap
+        # instead of sorting the whole list
+        top_conditions = heapq.nlargest(
+            3, conditions, key=lambda x: x.get('confidence', 0)
+        )
         
+        condition_names = [c.get('name', '') for c in top_conditions]
+
+        # One fused prompt resolves the specialty strategy for every
+        # condition at once - N LLM round-trips collapse to 1
+        try:
+            specialty_by_condition = await self._get_specialty_info(condition_names)
+        except Exception as e:
+            # Retries exhausted - degrade to the generic specialty defaults
+            logger.warning(f"Specialty lookup failed after retries: {e}")
+            specialty_by_condition = {}
+
+        # The grounded searches are independent, so run them concurrently
+        tasks = [
+            self._search_specialists(
+                specialty_by_condition.get(name, {"primary_specialty": "Specialist", "search_terms": []}),
+                name,
+                location
+            )
+            for name in condition_names
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
         all_specialists = []
-        
-        for condition in top_conditions:
-            condition_name = condition.get('name', '')
-            
-            # Generate search strategy
-            specialist_prompt = f"""You need to help find medical specialists for a patient with suspected {condition_name}.
+        for name, result in zip(condition_names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error finding specialists for {name}: {result}")
+                continue
+            all_specialists.extend(result)
+
+        # Deduplicate and rank specialists
+        return self._deduplicate_specialists(all_specialists)
+
+    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
+    async def _get_specialty_info(self, condition_names: List[str]) -> Dict[str, Dict]:
+        """Resolve specialty strategies in one LLM call
+
+        A single condition - the common case since the orchestrator
+        dispatches speculative per-condition tasks - skips the fused
+        results-array wrapper and asks for one SpecialtyInfo directly;
+        larger batches still collapse N round-trips to 1.
+        """
 
-Task: Identify the types of medical specialists who typically diagnose and treat {condition_name}.
+        single = len(condition_names) == 1
+        if single:
+            specialist_prompt = f"""You need to help find medical specialists for a patient with suspected {condition_names[0]}.
+
+Task: Identify the types of medical specialists who typically diagnose and treat this condition.
 
 Provide:
 1. Primary specialist type (e.g., "Geneticist", "Rheumatologist", "Cardiologist")
 2. Secondary specialist types that may be involved
 3. What to look for in a specialist (experience, certifications, research focus)
+4. Search terms to find these specialists"""
+            schema = SpecialtyInfo
+        else:
+            condition_list = "\n".join(f"- {name}" for name in condition_names)
+
+            specialist_prompt = f"""You need to help find medical specialists for a patient with these suspected conditions:
+{condition_list}
+
+Task: For EACH condition, identify the types of medical specialists who typically diagnose and treat it.
+
+Provide per condition:
+1. Primary specialist type (e.g., "Geneticist", "Rheumatologist", "Cardiologist")
+2. Secondary specialist types that may be involved
+3. What to look for in a specialist (experience, certifications, research focus)
 4. Search terms to find these specialists
 
-Return as JSON:
-{{
-    "primary_specialty": "...",
-    "secondary_specialties": ["...", "..."],
-    "key_qualifications": ["...", "..."],
-    "search_terms": ["...", "..."]
-}}"""
-
-            try:
-                response = await self.client.aio.models.generate_content(
-                    model=Config.MODEL_NAME,
-                    contents=specialist_prompt
-                )
-                
-                specialty_info = self._parse_specialty_info(response.text)
-                
-                # Now search for actual specialists
-                specialists = await self._search_specialists(
-                    specialty_info, 
-                    condition_name,
-                    location
-                )
-                
-                all_specialists.extend(specialists)
-                
-            except Exception as e:
-                print(f"Error finding specialists for {condition_name}: {e}")
-                continue
-        
-        # Deduplicate and rank specialists
-        return self._deduplicate_specialists(all_specialists)
-    
-    def _parse_specialty_info(self, response: str) -> Dict:
-        """Parse specialty information from LLM response"""
-        import json
-        import re
-        
+Return a results array with one entry per condition."""
+            schema = SpecialtyResults
+
         try:
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-        except:
-            pass
-        
+            # Memoized: repeated condition sets (Streamlit reruns) hit the
+            # cache instead of re-invoking the model. JSON mode + schema
+            # pin the output shape, so no prose wrapping to strip
+            response_text = await cached_generate(
+                self.client, Config.MODEL_NAME, specialist_prompt,
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': schema
+                }
+            )
+            parsed = self._parse_specialty_info(response_text)
+        except Exception as e:
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error resolving specialties")
+            parsed = {}
+
+        if single:
+            if parsed.get('primary_specialty'):
+                return {condition_names[0]: parsed}
+            return {}
+
         return {
-            "primary_specialty": "Specialist",
-            "search_terms": []
+            entry.get('condition', ''): entry
+            for entry in parsed.get('results', [])
         }
     
+    def _parse_specialty_info(self, response: str) -> Dict:
+        """Parse the schema-constrained JSON response"""
+
+        try:
+            return _json_loads(response)
+        except ValueError:
+            return {"results": []}
+    
     @async_retry_with_backoff(max_retries=Config.MAX_RETRIES)
     async def _search_specialists(
         self, 
@@ -182,21 +237,26 @@ Provide top 5 results with:
 - Why they're relevant for {condition}"""
 
         try:
-            response = await self.client.aio.models.generate_content(
-                model=Config.MODEL_NAME,
-                contents=search_prompt,
+            # Exact-match tier only: two specialist prompts differing
+            # just in condition or city embed nearly identically, and a
+            # semantic hit would return the wrong condition's specialists
+            response_text = await cached_generate(
+                self.client, Config.MODEL_NAME, search_prompt,
                 config={
                     'tools': [{'google_search': {}}]
-                }
+                },
+                semantic=False
             )
-            
+
             # Parse specialist information
-            specialists = self._parse_specialists(response.text, condition)
-            
+            specialists = self._parse_specialists(response_text, condition)
+
             return specialists
             
         except Exception as e:
-            print(f"Error searching specialists: {e}")
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error searching specialists")
             return []
     
     def _parse_specialists(self, response: str, condition: str) -> List[Dict]:
@@ -211,15 +271,28 @@ Provide top 5 results with:
         }]
     
     def _deduplicate_specialists(self, specialists: List[Dict]) -> List[Dict]:
-        """Remove duplicate specialists"""
-        # Simple deduplication by condition
+        """Remove duplicate specialists
+
+        Keys on normalized (condition, name, url) so genuine duplicates
+        collapse while distinct specialists for the same condition
+        survive - keying on condition alone dropped all but the first
+        entry per condition.
+        """
         seen = set()
         unique = []
-        
+
         for spec in specialists:
-            condition = spec.get('condition', '')
-            if condition not in seen:
-                seen.add(condition)
-                unique.append(spec)
-        
+            name = spec.get('name', '').casefold().strip()
+            url = spec.get('url', '').casefold().strip()
+            if not name and not url:
+                # Raw search_results entries carry no name/url - key on a
+                # short digest of the text instead
+                text = spec.get('search_results', '')
+                name = hashlib.blake2b(text[:128].encode(), digest_size=8).digest()
+            key = (spec.get('condition', '').casefold().strip(), name, url)
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(spec)
+
         return unique
\ No newline at end of file
@@ -1,8 +1,24 @@
 from google import genai
-from typing import Dict, List
-from utils.retry_utils import async_retry_with_backoff
+from typing import Dict, List, TypedDict
+import logging
+from utils.retry_utils import async_retry_with_backoff, is_retryable_error
+from utils.llm_cache import cached_generate, json_loads as _json_loads
 from config import Config
 
+logger = logging.getLogger("rarepath.agents.symptoms")
+
+
+class SymptomProfile(TypedDict):
+    """Response schema for symptom extraction - forces valid JSON output"""
+    primary_symptoms: List[str]
+    timeline: str
+    severity: str
+    frequency: str
+    family_history: str
+    previous_diagnoses: List[str]
+    questions_to_ask: List[str]
+
+
 class SymptomAggregatorAgent:
     """Agent responsible for collecting and organizing patient symptoms"""
     
@@ -38,25 +54,24 @@ Your task:
    - Family history of similar conditions
    - Previous diagnoses or tests
 
-Create a structured JSON output with:
-{{
-    "primary_symptoms": ["symptom1", "symptom2"],
-    "timeline": "description of symptom progression",
-    "severity": "overall severity assessment",
-    "frequency": "frequency patterns",
-    "family_history": "relevant family history",
-    "previous_diagnoses": ["diagnosis1", "diagnosis2"],
-    "questions_to_ask": ["question1", "question2"]
-}}
-
 Be empathetic and thorough."""
 
         try:
-            response = await self.client.aio.models.generate_content(
-                model=Config.MODEL_NAME,
-                contents=prompt
+            # Memoized: identical patient input (e.g. Streamlit reruns)
+            # returns the cached response instead of a fresh LLM call.
+            # JSON mode + schema pin the output shape, so no prose
+            # wrapping to strip and fewer output tokens per call.
+            # urgent: step 1 gates the whole journey, so a miss skips
+            # the batcher's flush window
+            response_text = await cached_generate(
+                self.client, Config.MODEL_NAME, prompt,
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': SymptomProfile
+                },
+                urgent=True
             )
-            
+
             # Store in conversation history
             self.conversation_history.append({
                 'role': 'user',
@@ -64,16 +79,18 @@ Be empathetic and thorough."""
             })
             self.conversation_history.append({
                 'role': 'assistant',
-                'content': response.text
+                'content': response_text
             })
-            
+
             # Parse response (in real implementation, ensure JSON parsing)
-            symptom_data = self._parse_symptom_response(response.text)
+            symptom_data = self._parse_symptom_response(response_text)
             
             return symptom_data
             
         except Exception as e:
-            print(f"Error in symptom collection: {e}")
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error in symptom collection")
             return {
                 "primary_symptoms": [],
                 "timeline": "",
@@ -82,24 +99,16 @@ Be empathetic and thorough."""
             }
     
     def _parse_symptom_response(self, response: str) -> Dict:
-        """Parse LLM response into structured symptom data"""
-        import json
-        import re
-        
-        # Try to extract JSON from response
+        """Parse the schema-constrained JSON response"""
+
         try:
-            # Look for JSON block
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-        except:
-            pass
-        
-        # Fallback to basic structure
-        return {
-            "primary_symptoms": [],
-            "timeline": "",
-            "severity": "unknown",
-            "questions_to_ask": [],
-            "raw_response": response
-        }
+            return _json_loads(response)
+        except ValueError:
+            # Fallback to basic structure
+            return {
+                "primary_symptoms": [],
+                "timeline": "",
+                "severity": "unknown",
+                "questions_to_ask": [],
+                "raw_response": response
+            }
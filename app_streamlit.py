@@ -5,7 +5,6 @@ A user-friendly web interface for the rare disease diagnostic assistant
 
 import streamlit as st
 from config import Config
-import time
 
 # Page configuration
 st.set_page_config(
@@ -15,54 +14,14 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for beautiful styling
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 0.5rem;
-    }
-    .sub-header {
-        text-align: center;
-        color: #666;
-        margin-bottom: 2rem;
-    }
-    .stButton>button {
-        width: 100%;
-        background-color: #1f77b4;
-        color: white;
-        font-size: 1.1rem;
-        padding: 0.75rem;
-        border-radius: 8px;
-    }
-    .stButton>button:hover {
-        background-color: #1557a0;
-    }
-    .symptom-box {
-        background-color: #f0f8ff;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border-left: 4px solid #1f77b4;
-        margin: 1rem 0;
-    }
-    .result-card {
-        background-color: #f9f9f9;
-        padding: 1.5rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-        border-left: 4px solid #28a745;
-    }
-    .warning-box {
-        background-color: #fff3cd;
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 4px solid #ffc107;
-        margin: 1rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for beautiful styling - kept in a static file and read
+# once per worker process instead of re-parsed inline on every rerun
+@st.cache_data(show_spinner=False)
+def load_css() -> str:
+    with open("assets/style.css") as f:
+        return "<style>" + f.read() + "</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # Initialize session state
 if 'diagnosis_complete' not in st.session_state:
@@ -76,25 +35,46 @@ def get_orchestrator():
     from agents.orchestrator import RarePathOrchestrator
     return RarePathOrchestrator(Config.GEMINI_API_KEY)
 
-def run_diagnosis(patient_input: str, location: str):
-    """Run the diagnostic journey asynchronously using cached orchestrator"""
+@st.cache_resource
+def get_event_loop():
+    """Persistent event loop on a background thread - reused across reruns
+    so the Gemini client's HTTP pool and TLS sessions survive clicks"""
     import asyncio
-    
-    async def async_diagnosis():
-        # Use cached orchestrator instead of creating new one
-        orchestrator = get_orchestrator()
-        result = await orchestrator.run_diagnostic_journey(
-            patient_input=patient_input,
-            patient_location=location
-        )
-        return result
-    
-    # Run async function
+    import threading
     loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(async_diagnosis())
-    loop.close()
-    return result
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+def stream_diagnosis(patient_input: str, location: str):
+    """Yield (stage, payload) events from the diagnostic journey as each
+    stage completes, pumped from the background loop through a queue"""
+    import asyncio
+    import queue
+
+    events = queue.Queue()
+
+    async def pump():
+        orchestrator = get_orchestrator()
+        try:
+            async for stage, payload in orchestrator.stream_diagnostic_journey(
+                patient_input=patient_input,
+                patient_location=location
+            ):
+                events.put((stage, payload))
+        except Exception as e:
+            events.put(('error', e))
+        finally:
+            events.put((None, None))
+
+    # Submit to the persistent loop instead of building (and tearing
+    # down) a fresh loop + connection pool on every click
+    asyncio.run_coroutine_threadsafe(pump(), get_event_loop())
+
+    while True:
+        stage, payload = events.get()
+        if stage is None:
+            break
+        yield stage, payload
 
 # Main UI
 st.markdown('<h1 class="main-header">RarePath AI</h1>', unsafe_allow_html=True)
@@ -137,6 +117,16 @@ if not Config.GEMINI_API_KEY:
     st.error("❌ GEMINI_API_KEY not found! Please set it in your .env file")
     st.stop()
 
+@st.cache_resource
+def prewarm():
+    """Kick off a background warmup once per worker process so the first
+    diagnosis doesn't pay the TLS handshake"""
+    import asyncio
+    asyncio.run_coroutine_threadsafe(get_orchestrator().warmup(), get_event_loop())
+    return True
+
+prewarm()
+
 # Main content area
 if not st.session_state.diagnosis_complete:
     st.markdown("### Describe Your Symptoms")
@@ -186,32 +176,47 @@ else:
         with st.spinner("🔬 Analyzing your symptoms... This may take 30-60 seconds..."):
             progress_bar = st.progress(0)
             status_text = st.empty()
-            
-            # Show progress updates
+            stage_preview = st.empty()
+
+            # Real progress driven by stage completions, not sleeps
+            stage_progress = {
+                'symptoms': (15, "🔍 Searching medical literature..."),
+                'conditions': (45, "🧪 Matching trials and specialists..."),
+                'trials': (60, "👨‍⚕️ Finding specialists..."),
+                'specialists': (75, "🤝 Connecting communities..."),
+                'communities': (85, "📊 Compiling report..."),
+                'report': (100, "📊 Compiling report..."),
+            }
+
             status_text.text("📋 Collecting symptom information...")
-            progress_bar.progress(20)
-            time.sleep(0.5)
-            
-            status_text.text("🔍 Searching medical literature...")
-            progress_bar.progress(40)
-            
-            # Run actual diagnosis
+
             try:
-                results = run_diagnosis(patient_input, location)
-                st.session_state.results = results
-                
-                status_text.text("👨‍⚕️ Finding specialists...")
-                progress_bar.progress(70)
-                time.sleep(0.3)
-                
-                status_text.text("📊 Compiling report...")
-                progress_bar.progress(100)
-                time.sleep(0.3)
-                
+                for stage, payload in stream_diagnosis(patient_input, location):
+                    if stage == 'error':
+                        raise payload
+
+                    percent, label = stage_progress.get(stage, (None, None))
+                    if percent is not None:
+                        progress_bar.progress(percent)
+                        status_text.text(label)
+
+                    # Surface partial results the moment they arrive
+                    if stage == 'symptoms':
+                        stage_preview.info(
+                            f"Identified {len(payload.get('primary_symptoms', []))} primary symptoms"
+                        )
+                    elif stage == 'conditions':
+                        names = [c.get('name', '') for c in payload[:3] if c.get('name')]
+                        if names:
+                            stage_preview.info("Candidate conditions: " + ", ".join(names))
+                    elif stage == 'report':
+                        st.session_state.results = payload
+
                 status_text.empty()
                 progress_bar.empty()
+                stage_preview.empty()
                 st.success("✅ Analysis complete!")
-                
+
             except Exception as e:
                 st.error(f"❌ Error during analysis: {str(e)}")
                 st.info("💡 Try again in a few moments if you hit API rate limits")
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,6 +11,9 @@ class Config:
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     NCBI_API_KEY = os.getenv("NCBI_API_KEY", "")
     
+    # Debug logging (set DEBUG=1 in the environment to enable)
+    DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+
     # Model Configuration
     MODEL_NAME = "gemini-2.0-flash-001"  # Use stable Gemini 2.0 Flash model
     MAX_TOKENS = 8192
@@ -22,6 +26,10 @@ class Config:
     
     # Rate Limiting (calls per minute)
     RATE_LIMIT_CALLS_PER_MINUTE = 10
+    MAX_CONCURRENT_LLM = 4
+
+    # Cached diagnostic journeys expire after a week
+    JOURNEY_CACHE_TTL_SECONDS = 86400 * 7
     
     # Search Parameters
     PUBMED_MAX_RESULTS = 20
@@ -32,3 +40,14 @@ class Config:
     SYSTEM_PROMPT = """You are RarePath AI, an expert medical assistant specializing in rare disease diagnosis support. 
     You help patients aggregate their symptoms, search medical literature, and connect with specialists.
     Always maintain a compassionate, clear, and professional tone. Never provide definitive diagnoses - only suggestions for discussion with healthcare providers."""
+
+
+@lru_cache(maxsize=1)
+def get_client(api_key: str = None):
+    """Shared Gemini client - one connection pool for the whole process
+
+    Every agent multiplexes its calls over the same client, so TCP/TLS
+    setup is paid once instead of per agent or per Streamlit rerun.
+    """
+    from google import genai
+    return genai.Client(api_key=api_key or Config.GEMINI_API_KEY)
@@ -1,5 +1,9 @@
 from typing import Dict, List
-import json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class EvaluationMetrics:
     """Calculate evaluation metrics for RarePath AI"""
@@ -11,7 +15,48 @@ class EvaluationMetrics:
         total_tests = len(test_results)
         if total_tests == 0:
             return {}
-        
+
+        if np is None:
+            return EvaluationMetrics._calculate_accuracy_python(test_results)
+
+        # Extract the evaluation dicts once, then reduce each metric as a
+        # C-vectorized boolean mean instead of four interpreter passes
+        evals = [r.get('evaluation', {}) for r in test_results]
+        n = total_tests
+
+        top1 = np.fromiter(
+            (bool(e.get('condition_match')) for e in evals), dtype=bool, count=n
+        )
+        top5 = np.fromiter(
+            (len(e.get('found_conditions', [])) > 0 for e in evals), dtype=bool, count=n
+        )
+        specialist = np.fromiter(
+            (bool(e.get('specialist_match')) for e in evals), dtype=bool, count=n
+        )
+        success = np.fromiter(
+            (bool(r.get('success')) for r in test_results), dtype=bool, count=n
+        )
+
+        confidences = np.concatenate([
+            np.asarray(e.get('confidence_scores', []), dtype=np.float32)
+            for e in evals
+        ]) if any(e.get('confidence_scores') for e in evals) else np.empty(0, dtype=np.float32)
+
+        return {
+            'total_tests': total_tests,
+            'top1_accuracy': float(top1.mean()),
+            'top5_accuracy': float(top5.mean()),
+            'specialist_accuracy': float(specialist.mean()),
+            'average_confidence': float(confidences.mean()) if confidences.size else 0,
+            'success_rate': float(success.mean())
+        }
+
+    @staticmethod
+    def _calculate_accuracy_python(test_results: List[Dict]) -> Dict:
+        """Pure-Python fallback used when NumPy is unavailable"""
+
+        total_tests = len(test_results)
+
         # Top-K accuracy
         top1_correct = sum(1 for r in test_results if r.get('evaluation', {}).get('condition_match'))
         top5_correct = sum(1 for r in test_results if len(r.get('evaluation', {}).get('found_conditions', [])) > 0)
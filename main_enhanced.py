@@ -1,4 +1,11 @@
 import asyncio
+
+try:
+    # Drop-in libuv event loop - noticeably faster on network-heavy runs
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
 from config import Config
 from agents.orchestrator import RarePathOrchestrator
 
@@ -11,8 +18,9 @@ async def main():
         print("Please create a .env file with your API key")
         return
     
-    # Initialize orchestrator
+    # Initialize orchestrator and warm connections while the user types
     orchestrator = RarePathOrchestrator(Config.GEMINI_API_KEY)
+    warmup = asyncio.create_task(orchestrator.warmup())
     
     print("🏥 RarePath AI - Rare Disease Diagnostic Assistant")
     print("=" * 60)
@@ -24,7 +32,9 @@ async def main():
     lines = []
     print("Enter your symptoms:")
     while True:
-        line = input()
+        # to_thread keeps the event loop free, so the warmup task runs
+        # while the user is still typing
+        line = await asyncio.to_thread(input)
         if line == "":
             if lines:  # If we have at least one line and user presses enter again
                 break
@@ -41,7 +51,8 @@ async def main():
     print(f"📋 Analyzing your symptoms...")
     print("=" * 60)
     
-    # Run diagnostic journey
+    # Run diagnostic journey (connections are already warm)
+    await warmup
     result = await orchestrator.run_diagnostic_journey(patient_input)
     
     # Display results
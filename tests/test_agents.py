@@ -1,4 +1,12 @@
 import asyncio
+
+try:
+    # Drop-in libuv event loop - noticeably faster on network-heavy runs
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+import sys
 from config import Config
 from agents.orchestrator import RarePathOrchestrator
 from tests.test_agents import AgentTester
@@ -11,6 +19,7 @@ async def interactive_mode():
         return
     
     orchestrator = RarePathOrchestrator(Config.GEMINI_API_KEY)
+    warmup = asyncio.create_task(orchestrator.warmup())
     
     print("🏥 RarePath AI - Rare Disease Diagnostic Assistant")
     print("=" * 60)
@@ -21,7 +30,7 @@ async def interactive_mode():
     print("Enter your symptoms (press Enter twice when done):")
     lines = []
     while True:
-        line = input()
+        line = await asyncio.to_thread(input)
         if line == "" and lines:
             break
         lines.append(line)
@@ -33,13 +42,14 @@ async def interactive_mode():
         return
     
     # Get location
-    location = input("\nWhat's your location (city, state, or country)? ")
+    location = await asyncio.to_thread(input, "\nWhat's your location (city, state, or country)? ")
     if not location:
         location = "United States"
     
     print("\n" + "=" * 60)
     
-    # Run diagnostic journey
+    # Run diagnostic journey (connections are already warm)
+    await warmup
     report = await orchestrator.run_diagnostic_journey(
         patient_input,
         patient_location=location
@@ -50,19 +60,29 @@ async def interactive_mode():
 
 def display_report(report: Dict):
     """Display formatted diagnostic report"""
+    sys.stdout.write(_render_report(report) + "\n")
+
+# Precomputed separators - the report body reuses them many times
+BIG = "=" * 80
+SEP = "-" * 80
+
+def _render_report(report: Dict) -> str:
+    """Assemble the report into one string so it's emitted in a single write"""
+
+    parts = []
     
-    print("\n" + "=" * 80)
-    print("📊 YOUR COMPREHENSIVE DIAGNOSTIC REPORT")
-    print("=" * 80)
+    parts.append("\n" + BIG)
+    parts.append("📊 YOUR COMPREHENSIVE DIAGNOSTIC REPORT")
+    parts.append(BIG)
     
     # Executive Summary
-    print("\n📝 EXECUTIVE SUMMARY")
-    print("-" * 80)
-    print(report.get('executive_summary', 'No summary available'))
+    parts.append("\n📝 EXECUTIVE SUMMARY")
+    parts.append(SEP)
+    parts.append(report.get('executive_summary', 'No summary available'))
     
     # Potential Diagnoses
-    print("\n\n🔍 POTENTIAL RARE DISEASE DIAGNOSES")
-    print("-" * 80)
+    parts.append("\n\n🔍 POTENTIAL RARE DISEASE DIAGNOSES")
+    parts.append(SEP)
     diagnoses = report.get('potential_diagnoses', [])
     
     if diagnoses:
@@ -70,88 +90,90 @@ def display_report(report: Dict):
             if isinstance(diagnosis, dict):
                 name = diagnosis.get('name', 'Unknown Condition')
                 confidence = diagnosis.get('confidence', 0)
-                print(f"\n{i}. {name}")
-                print(f"   Confidence: {'High' if confidence > 0.7 else 'Medium' if confidence > 0.4 else 'Low'}")
+                parts.append(f"\n{i}. {name}")
+                parts.append(f"   Confidence: {'High' if confidence > 0.7 else 'Medium' if confidence > 0.4 else 'Low'}")
                 
                 if 'matching_symptoms' in diagnosis:
-                    print(f"   Matching Symptoms: {', '.join(diagnosis['matching_symptoms'])}")
+                    parts.append(f"   Matching Symptoms: {', '.join(diagnosis['matching_symptoms'])}")
                 
                 if 'diagnostic_tests' in diagnosis:
-                    print(f"   Recommended Tests: {', '.join(diagnosis['diagnostic_tests'])}")
+                    parts.append(f"   Recommended Tests: {', '.join(diagnosis['diagnostic_tests'])}")
     else:
-        print("No specific conditions identified. Please consult with your doctor.")
+        parts.append("No specific conditions identified. Please consult with your doctor.")
     
     # Specialist Recommendations
-    print("\n\n👨‍⚕️ SPECIALIST RECOMMENDATIONS")
-    print("-" * 80)
+    parts.append("\n\n👨‍⚕️ SPECIALIST RECOMMENDATIONS")
+    parts.append(SEP)
     specialists = report.get('specialist_recommendations', [])
     
     if specialists:
         for spec in specialists[:5]:
             condition = spec.get('condition', '')
-            print(f"\nFor {condition}:")
-            print(spec.get('recommendations', 'See specialist'))
+            parts.append(f"\nFor {condition}:")
+            parts.append(spec.get('recommendations', 'See specialist'))
     else:
-        print("Consult with your primary care physician for specialist referrals.")
+        parts.append("Consult with your primary care physician for specialist referrals.")
     
     # Clinical Trials
-    print("\n\n🔬 RELEVANT CLINICAL TRIALS")
-    print("-" * 80)
+    parts.append("\n\n🔬 RELEVANT CLINICAL TRIALS")
+    parts.append(SEP)
     trials = report.get('clinical_trials', [])
     
     if trials:
         for i, trial in enumerate(trials[:3], 1):
-            print(f"\n{i}. {trial.get('title', 'Unknown Trial')}")
-            print(f"   Status: {trial.get('status', 'Unknown')}")
-            print(f"   NCT ID: {trial.get('nct_id', 'N/A')}")
-            print(f"   URL: {trial.get('url', 'N/A')}")
+            parts.append(f"\n{i}. {trial.get('title', 'Unknown Trial')}")
+            parts.append(f"   Status: {trial.get('status', 'Unknown')}")
+            parts.append(f"   NCT ID: {trial.get('nct_id', 'N/A')}")
+            parts.append(f"   URL: {trial.get('url', 'N/A')}")
             locations = trial.get('locations', [])
             if locations:
-                print(f"   Locations: {', '.join(locations[:3])}")
+                parts.append(f"   Locations: {', '.join(locations[:3])}")
     else:
-        print("No active clinical trials found at this time.")
+        parts.append("No active clinical trials found at this time.")
     
     # Community Resources
-    print("\n\n🤝 PATIENT COMMUNITY RESOURCES")
-    print("-" * 80)
+    parts.append("\n\n🤝 PATIENT COMMUNITY RESOURCES")
+    parts.append(SEP)
     communities = report.get('community_resources', [])
     
     if communities:
         for comm in communities[:3]:
             condition = comm.get('condition', '')
-            print(f"\nFor {condition}:")
-            print(comm.get('resources', 'Check patient advocacy websites'))
+            parts.append(f"\nFor {condition}:")
+            parts.append(comm.get('resources', 'Check patient advocacy websites'))
     else:
-        print("Search for patient advocacy groups related to your conditions.")
+        parts.append("Search for patient advocacy groups related to your conditions.")
     
     # Next Steps
-    print("\n\n📋 RECOMMENDED NEXT STEPS")
-    print("-" * 80)
+    parts.append("\n\n📋 RECOMMENDED NEXT STEPS")
+    parts.append(SEP)
     for i, step in enumerate(report.get('next_steps', []), 1):
-        print(f"{i}. {step}")
+        parts.append(f"{i}. {step}")
     
     # Questions for Doctor
-    print("\n\n❓ QUESTIONS TO ASK YOUR DOCTOR")
-    print("-" * 80)
+    parts.append("\n\n❓ QUESTIONS TO ASK YOUR DOCTOR")
+    parts.append(SEP)
     questions = report.get('questions_for_doctor', [])
     for i, question in enumerate(questions, 1):
-        print(f"{i}. {question}")
+        parts.append(f"{i}. {question}")
     
     # Disclaimer
-    print("\n\n⚠️  IMPORTANT DISCLAIMER")
-    print("-" * 80)
-    print(report.get('disclaimer', ''))
+    parts.append("\n\n⚠️  IMPORTANT DISCLAIMER")
+    parts.append(SEP)
+    parts.append(report.get('disclaimer', ''))
     
     # Metrics
-    print("\n\n📈 EXECUTION METRICS")
-    print("-" * 80)
+    parts.append("\n\n📈 EXECUTION METRICS")
+    parts.append(SEP)
     metrics = report.get('execution_metrics', {})
-    print(f"Total Processing Time: {metrics.get('total_time_seconds', 0):.2f} seconds")
-    print(f"Agents Used: {metrics.get('agents_used', 0)}")
+    parts.append(f"Total Processing Time: {metrics.get('total_time_seconds', 0):.2f} seconds")
+    parts.append(f"Agents Used: {metrics.get('agents_used', 0)}")
     
-    print("\n" + "=" * 80)
-    print("Report Complete. Save this information to share with your healthcare providers.")
-    print("=" * 80)
+    parts.append("\n" + BIG)
+    parts.append("Report Complete. Save this information to share with your healthcare providers.")
+    parts.append(BIG)
+
+    return "\n".join(parts)
 
 async def test_mode():
     """Run automated tests"""
@@ -5,7 +5,7 @@ from tools.pubmed_tool import PubMedTool
 
 async def test_pubmed():
     tool = PubMedTool()
-    results = tool.search("Ehlers-Danlos syndrome joint hypermobility", max_results=3)
+    results = await tool.search("Ehlers-Danlos syndrome joint hypermobility", max_results=3)
     
     print(f"Found {len(results)} articles:")
     for article in results:
@@ -1,12 +1,37 @@
-import requests
+import itertools
+import logging
 from typing import List, Dict
 
+import httpx
+
+from config import Config
+from tools.http_client import get_async_client
+from utils.async_cache import AsyncTTLCache
+from utils.retry_utils import async_retry_with_backoff
+
+logger = logging.getLogger("rarepath.tools.trials")
+
 class ClinicalTrialsTool:
     """Tool for searching ClinicalTrials.gov"""
     
     BASE_URL = "https://clinicaltrials.gov/api/v2/studies"
-    
-    def search(self, condition: str, max_results: int = 10) -> List[Dict]:
+
+    # Shared across instances - the same condition queries recur across runs
+    _search_cache = AsyncTTLCache(maxsize=1024, ttl_seconds=3600)
+
+    def __init__(self, client: httpx.AsyncClient = None):
+        # Injected client for tests; otherwise all tools share one pool
+        self._client = client
+
+    def _get_client(self) -> httpx.AsyncClient:
+        return self._client or get_async_client()
+
+    async def aclose(self):
+        """Release an injected client (the shared pool is closed centrally)"""
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def search(self, condition: str, max_results: int = 10) -> List[Dict]:
         """
         Search for clinical trials matching a condition
         
@@ -17,18 +42,25 @@ class ClinicalTrialsTool:
         Returns:
             List of trial dictionaries
         """
+        cache_key = (condition.strip().lower(), max_results)
+        cached = await self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             params = {
                 'query.cond': condition,
                 'filter.overallStatus': 'RECRUITING',  # Only active trials
                 'pageSize': max_results,
-                'format': 'json'
+                'format': 'json',
+                # Project only the fields we read - full study protocols
+                # run to hundreds of KB each
+                'fields': ('NCTId,BriefTitle,BriefSummary,OverallStatus,'
+                           'EligibilityCriteria,LocationCity,LocationState,'
+                           'LocationCountry')
             }
             
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._fetch_studies(params)
             trials = []
             
             for study in data.get('studies', []):
@@ -37,30 +69,46 @@ class ClinicalTrialsTool:
                 description = protocol.get('descriptionModule', {})
                 eligibility = protocol.get('eligibilityModule', {})
                 contacts = protocol.get('contactsLocationsModule', {})
+                nct_id = identification.get('nctId', '')
                 
                 trials.append({
-                    'nct_id': identification.get('nctId', ''),
+                    'nct_id': nct_id,
                     'title': identification.get('briefTitle', ''),
                     'description': description.get('briefSummary', ''),
-                    'status': study.get('protocolSection', {}).get('statusModule', {}).get('overallStatus', ''),
+                    'status': protocol.get('statusModule', {}).get('overallStatus', ''),
                     'eligibility': eligibility.get('eligibilityCriteria', ''),
                     'locations': self._extract_locations(contacts),
-                    'url': f"https://clinicaltrials.gov/study/{identification.get('nctId', '')}"
+                    'url': f"https://clinicaltrials.gov/study/{nct_id}"
                 })
             
+            await self._search_cache.set(cache_key, trials)
             return trials
             
-        except Exception as e:
-            print(f"Error searching clinical trials: {e}")
+        except (httpx.HTTPError, ValueError) as e:
+            # Retries exhausted or unparseable payload - degrade to no
+            # results for this condition rather than failing the journey
+            logger.warning(f"Clinical trials search failed: {e}")
             return []
+
+    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES, pace=False)
+    async def _fetch_studies(self, params: Dict) -> Dict:
+        """Issue the studies request, retrying transient failures"""
+        response = await self._get_client().get(self.BASE_URL, params=params)
+        response.raise_for_status()
+        return response.json()
     
     def _extract_locations(self, contacts_module: Dict) -> List[str]:
-        """Extract trial locations from contacts module"""
-        locations = []
-        for location in contacts_module.get('locations', []):
-            city = location.get('city', '')
-            state = location.get('state', '')
-            country = location.get('country', '')
-            if city or state:
-                locations.append(f"{city}, {state}, {country}".strip(', '))
-        return locations[:5]  # Limit to 5 locations
\ No newline at end of file
+        """Extract up to 5 trial locations from the contacts module
+
+        Lazily formatted - large trials list dozens of sites, and
+        islice stops the walk as soon as five are collected.
+        """
+        def gen():
+            for location in contacts_module.get('locations', ()):
+                city = location.get('city', '')
+                state = location.get('state', '')
+                country = location.get('country', '')
+                if city or state:
+                    yield f"{city}, {state}, {country}".strip(', ')
+
+        return list(itertools.islice(gen(), 5))
\ No newline at end of file
@@ -1,11 +1,35 @@
 from google import genai
-from typing import List, Dict
-from utils.retry_utils import async_retry_with_backoff
+from typing import List, Dict, Optional
+import asyncio
+import logging
+import re
+from utils.async_cache import AsyncTTLCache
+from utils.llm_cache import json_loads as _json_loads
+from utils.retry_utils import async_retry_with_backoff, is_retryable_error
 from config import Config
 
+logger = logging.getLogger("rarepath.tools.google_search")
+
+# Compiled once at import - grabs the JSON array out of a grounded response
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+
+# Invariant instruction hoisted to module scope with the query appended
+# last, so every call shares a byte-identical prefix that Gemini's
+# implicit prompt caching can reuse. Explicit cachedContents is not
+# worth it here: its minimum cacheable size is orders of magnitude
+# larger than this boilerplate.
+_SEARCH_PROMPT = (
+    'You are a web search tool. Return the top {k} most relevant results '
+    'strictly as a JSON array of objects with fields "title", "url", and '
+    '"snippet". Output only the JSON array. Search for: {query}'
+)
+
 class GoogleSearchTool:
     """Tool for performing web searches using Gemini with Google Search grounding"""
-    
+
+    # Shared across instances - the same condition queries recur across runs
+    _search_cache = AsyncTTLCache(maxsize=1024, ttl_seconds=3600)
+
     def __init__(self, client: genai.Client):
         self.client = client
     
@@ -21,26 +45,82 @@ class GoogleSearchTool:
         Returns:
             List of search results
         """
+        cache_key = (query.strip().lower(), max_results)
+        cached = await self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            # Use Gemini with Google Search grounding
+            # Use Gemini with Google Search grounding. The google_search
+            # tool can't be combined with a response_schema, so the JSON
+            # shape is pinned in the prompt instead
             response = await self.client.aio.models.generate_content(
                 model=Config.MODEL_NAME,
-                contents=f"Search for: {query}. Provide the top {max_results} most relevant results with titles, URLs, and brief descriptions.",
+                contents=_SEARCH_PROMPT.format(k=max_results, query=query),
                 config={
                     'tools': [{'google_search': {}}]  # Enable Google Search
                 }
             )
-            
-            # Parse results
-            results = self._parse_search_results(response.text)
-            return results
-            
         except Exception as e:
-            print(f"Error in Google search: {e}")
+            if is_retryable_error(e):
+                raise  # let the retry decorator back off and retry
+            logger.exception("Non-retryable error in Google search")
             return []
+
+        results = self._parse_search_results(response.text)
+        if results is None:
+            # Model ignored the JSON format - hand back the raw text but
+            # don't cache a degenerate result for an hour
+            return [{'content': response.text}]
+
+        await self._search_cache.set(cache_key, results)
+        return results
     
-    def _parse_search_results(self, response_text: str) -> List[Dict]:
-        """Parse search results from response"""
-        # For now, return the raw text
-        # In production, parse structured results
-        return [{'content': response_text}]
+    async def search_many(
+        self,
+        queries: List[str],
+        max_results: int = 5,
+        concurrency: int = None
+    ) -> List[List[Dict]]:
+        """
+        Run several grounded searches concurrently
+
+        Overlaps the multi-second Gemini inference latency across all
+        queries while a semaphore bounds in-flight calls. Failed queries
+        return [] instead of failing the batch.
+
+        Returns:
+            One result list per query, in input order
+        """
+        if concurrency is None:
+            concurrency = Config.MAX_CONCURRENT_LLM
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(query: str) -> List[Dict]:
+            async with sem:
+                return await self.search(query, max_results)
+
+        results = await asyncio.gather(
+            *(one(q) for q in queries), return_exceptions=True
+        )
+        return [[] if isinstance(r, Exception) else r for r in results]
+
+    def _parse_search_results(self, response_text: str) -> Optional[List[Dict]]:
+        """Parse the JSON results array out of the grounded response
+
+        Consumers get [{'title', 'url', 'snippet'}, ...] directly instead
+        of a raw text blob that needs another LLM pass. Returns None if
+        the model ignored the format, so the caller can decide whether
+        the raw text is worth keeping.
+        """
+        try:
+            match = _JSON_ARRAY_RE.search(response_text)
+            if match:
+                results = _json_loads(match.group())
+                if isinstance(results, list):
+                    return results
+        except ValueError:
+            pass
+
+        return None
@@ -0,0 +1,28 @@
+"""
+Shared pooled HTTP client for the tools package
+One keep-alive pool serves every external API so handshakes are paid once per host
+"""
+
+import httpx
+
+_client = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Process-wide pooled httpx client shared by all tools"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+            timeout=15
+        )
+    return _client
+
+
+async def aclose():
+    """Release the shared pool on shutdown"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,123 +1,257 @@
-import requests
+import asyncio
+import io
+import logging
 from typing import List, Dict
 import xml.etree.ElementTree as ET
-import time
+
+import httpx
+
+from config import Config
+from tools.http_client import get_async_client
+from utils.async_cache import AsyncTTLCache
+from utils.retry_utils import AsyncTokenBucket, async_retry_with_backoff
+
+try:
+    # C-accelerated streaming parser; stdlib ElementTree is the fallback
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+logger = logging.getLogger("rarepath.tools.pubmed")
 
 class PubMedTool:
     """Tool for searching PubMed medical literature"""
-    
+
     BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
-    
-    def __init__(self, api_key: str = ""):
+
+    # Shared across instances - the same condition queries recur across runs
+    _search_cache = AsyncTTLCache(maxsize=1024, ttl_seconds=3600)
+
+    def __init__(self, api_key: str = "", client: httpx.AsyncClient = None):
         self.api_key = api_key
-    
-    def search(self, query: str, max_results: int = 20) -> List[Dict]:
+        # Injected client for tests; otherwise all tools share one pool
+        self._client = client
+        # NCBI allows 3 requests/s anonymously, 10 with an API key; a
+        # small-burst token bucket holds every esearch/efetch to that
+        # rate while still letting concurrent searches overlap
+        rps = 10 if api_key else 3
+        self._rate_limiter = AsyncTokenBucket(
+            calls_per_minute=rps * 60, max_concurrency=rps, burst=rps
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        return self._client or get_async_client()
+
+    async def aclose(self):
+        """Release an injected client (the shared pool is closed centrally)"""
+        if self._client is not None:
+            await self._client.aclose()
+
+    # efetch accepts a comma-separated PMID list; stay well under the limit
+    EFETCH_BATCH_SIZE = 200
+
+    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES, pace=False)
+    async def _esearch(self, query: str, max_results: int = 20) -> List[str]:
+        """Search for article PMIDs matching the query"""
+        search_url = f"{self.BASE_URL}esearch.fcgi"
+        search_params = {
+            'db': 'pubmed',
+            'term': query,
+            'retmax': max_results,
+            'retmode': 'json',
+            'sort': 'relevance'
+        }
+
+        if self.api_key:
+            search_params['api_key'] = self.api_key
+
+        await self._rate_limiter.acquire()
+        response = await self._get_client().get(search_url, params=search_params)
+        response.raise_for_status()
+
+        return response.json().get('esearchresult', {}).get('idlist', [])
+
+    @async_retry_with_backoff(max_retries=Config.MAX_RETRIES, pace=False)
+    async def _efetch(self, pmids: List[str]) -> List[Dict]:
+        """Fetch article details for a list of PMIDs, chunked per request"""
+        articles = []
+        fetch_url = f"{self.BASE_URL}efetch.fcgi"
+
+        for start in range(0, len(pmids), self.EFETCH_BATCH_SIZE):
+            batch = pmids[start:start + self.EFETCH_BATCH_SIZE]
+            fetch_params = {
+                'db': 'pubmed',
+                'id': ','.join(batch),
+                'retmode': 'xml'
+            }
+
+            if self.api_key:
+                fetch_params['api_key'] = self.api_key
+
+            await self._rate_limiter.acquire()
+            response = await self._get_client().get(fetch_url, params=fetch_params)
+            response.raise_for_status()
+            articles.extend(self._parse_pubmed_xml(response.content))
+
+        return articles
+
+    async def search(self, query: str, max_results: int = 20) -> List[Dict]:
         """
         Search PubMed for articles matching the query
-        
+
         Args:
             query: Search terms (e.g., "Ehlers-Danlos syndrome joint hypermobility")
             max_results: Maximum number of results to return
-            
+
         Returns:
             List of article dictionaries with title, abstract, authors, etc.
         """
+        cache_key = (query.strip().lower(), max_results)
+        cached = await self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            # Step 1: Search for article IDs
-            search_url = f"{self.BASE_URL}esearch.fcgi"
-            search_params = {
-                'db': 'pubmed',
-                'term': query,
-                'retmax': max_results,
-                'retmode': 'json',
-                'sort': 'relevance'
-            }
-            
-            if self.api_key:
-                search_params['api_key'] = self.api_key
-            
-            response = requests.get(search_url, params=search_params, timeout=10)
-            response.raise_for_status()
-            
-            search_results = response.json()
-            id_list = search_results.get('esearchresult', {}).get('idlist', [])
-            
+            id_list = await self._esearch(query, max_results)
+
             if not id_list:
                 return []
-            
-            # Rate limiting - be nice to NCBI servers
-            time.sleep(0.34)  # Max 3 requests per second without API key
-            
-            # Step 2: Fetch article details
-            fetch_url = f"{self.BASE_URL}efetch.fcgi"
-            fetch_params = {
-                'db': 'pubmed',
-                'id': ','.join(id_list),
-                'retmode': 'xml'
-            }
-            
-            if self.api_key:
-                fetch_params['api_key'] = self.api_key
-            
-            fetch_response = requests.get(fetch_url, params=fetch_params, timeout=15)
-            fetch_response.raise_for_status()
-            
-            # Step 3: Parse XML results
-            articles = self._parse_pubmed_xml(fetch_response.text)
-            
+
+            articles = await self._efetch(id_list)
+            await self._search_cache.set(cache_key, articles)
             return articles
-            
-        except Exception as e:
-            print(f"Error searching PubMed: {e}")
+
+        except (httpx.HTTPError, ValueError) as e:
+            # Retries exhausted or unparseable payload - degrade to no
+            # results for this query rather than failing the journey
+            logger.warning(f"PubMed search failed: {e}")
             return []
-    
-    def _parse_pubmed_xml(self, xml_text: str) -> List[Dict]:
-        """Parse PubMed XML response into structured data"""
+
+    async def search_many(self, queries: List[str], max_results: int = 20) -> List[List[Dict]]:
+        """
+        Search several queries with one shared efetch
+
+        Runs the esearches concurrently, unions their PMIDs into a single
+        batched efetch (amortizing the round-trip across queries), and
+        fans the articles back out per query.
+
+        Returns:
+            One article list per query, in input order
+        """
+        cache_key = (tuple(q.strip().lower() for q in queries), max_results)
+        cached = await self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            ids_per_query = await asyncio.gather(
+                *[self._esearch(q, max_results) for q in queries]
+            )
+
+            # Preserve order while deduplicating across queries
+            all_ids = list(dict.fromkeys(
+                pmid for id_list in ids_per_query for pmid in id_list
+            ))
+            if not all_ids:
+                return [[] for _ in queries]
+
+            by_pmid = {a['pmid']: a for a in await self._efetch(all_ids)}
+            results = [
+                [by_pmid[pmid] for pmid in id_list if pmid in by_pmid]
+                for id_list in ids_per_query
+            ]
+            await self._search_cache.set(cache_key, results)
+            return results
+
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"PubMed search failed: {e}")
+            return [[] for _ in queries]
+
+    @staticmethod
+    def _extract_article(article) -> Dict:
+        """Extract one article's fields in a single pass over its subtree
+
+        Each './/' find is a full recursive descent; walking the tree
+        once and dispatching on tag name visits every node exactly once
+        instead of five times per article.
+        """
+
+        title = None
+        abstract = None
+        pmid = None
+        year = None
+        authors = []
+
+        for el in article.iter():
+            tag = el.tag
+            if tag == 'ArticleTitle':
+                if title is None:
+                    title = el.text
+            elif tag == 'AbstractText':
+                if abstract is None:
+                    abstract = el.text
+            elif tag == 'PMID':
+                if pmid is None:
+                    pmid = el.text
+            elif tag == 'PubDate':
+                # Only PubDate's Year counts - DateCompleted/DateRevised
+                # carry Year elements too
+                year_elem = el.find('Year')
+                if year is not None or year_elem is None:
+                    continue
+                year = year_elem.text
+            elif tag == 'Author':
+                lastname = el.find('LastName')
+                firstname = el.find('ForeName')
+                if lastname is not None and firstname is not None:
+                    authors.append(f"{firstname.text} {lastname.text}")
+
+        title = title if title is not None else "No title"
+        abstract = abstract if abstract is not None else "No abstract available"
+        pmid = pmid if pmid is not None else ""
+        year = year if year is not None else "Unknown"
+
+        return {
+            'pmid': pmid,
+            'title': title,
+            'abstract': abstract,
+            'authors': authors,
+            'year': year,
+            'url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else ""
+        }
+
+    def _parse_pubmed_xml(self, xml_data: bytes) -> List[Dict]:
+        """Parse PubMed XML response into structured data
+
+        Uses lxml.iterparse when available: one C-level streaming pass
+        that frees each PubmedArticle subtree after extraction, instead
+        of building the whole DOM and re-scanning it per field. Takes
+        bytes so the HTTP body never pays a decode+re-encode.
+        """
         articles = []
-        
+
         try:
-            root = ET.fromstring(xml_text)
-            
+            if lxml_etree is not None:
+                for _, article in lxml_etree.iterparse(io.BytesIO(xml_data), tag='PubmedArticle'):
+                    try:
+                        articles.append(self._extract_article(article))
+                    except Exception as e:
+                        logger.warning(f"Error parsing article: {e}")
+                    finally:
+                        article.clear()
+                        while article.getprevious() is not None:
+                            del article.getparent()[0]
+                return articles
+
+            root = ET.fromstring(xml_data)
             for article in root.findall('.//PubmedArticle'):
                 try:
-                    # Extract title
-                    title_elem = article.find('.//ArticleTitle')
-                    title = title_elem.text if title_elem is not None else "No title"
-                    
-                    # Extract abstract
-                    abstract_elem = article.find('.//AbstractText')
-                    abstract = abstract_elem.text if abstract_elem is not None else "No abstract available"
-                    
-                    # Extract PMID
-                    pmid_elem = article.find('.//PMID')
-                    pmid = pmid_elem.text if pmid_elem is not None else ""
-                    
-                    # Extract publication year
-                    year_elem = article.find('.//PubDate/Year')
-                    year = year_elem.text if year_elem is not None else "Unknown"
-                    
-                    # Extract authors
-                    authors = []
-                    for author in article.findall('.//Author'):
-                        lastname = author.find('LastName')
-                        firstname = author.find('ForeName')
-                        if lastname is not None and firstname is not None:
-                            authors.append(f"{firstname.text} {lastname.text}")
-                    
-                    articles.append({
-                        'pmid': pmid,
-                        'title': title,
-                        'abstract': abstract,
-                        'authors': authors,
-                        'year': year,
-                        'url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else ""
-                    })
-                    
+                    articles.append(self._extract_article(article))
                 except Exception as e:
-                    print(f"Error parsing article: {e}")
+                    logger.warning(f"Error parsing article: {e}")
                     continue
-                    
+
         except Exception as e:
-            print(f"Error parsing XML: {e}")
-        
-        return articles
\ No newline at end of file
+            logger.warning(f"Error parsing XML: {e}")
+
+        return articles
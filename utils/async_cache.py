@@ -0,0 +1,44 @@
+"""
+In-process TTL cache for async tool lookups
+Condition names recur heavily across runs, so repeated searches become dict hits
+"""
+
+import asyncio
+import time
+
+
+class AsyncTTLCache:
+    """
+    Bounded TTL cache safe for concurrent async callers
+
+    Entries expire after ttl_seconds; once maxsize is reached the oldest
+    entry is evicted (insertion-order FIFO, close enough to LRU for
+    repeat-heavy lookup workloads).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 3600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}  # key -> (expiry, value)
+        self._lock = asyncio.Lock()
+
+    async def get(self, key):
+        """Return the cached value, or None if missing or expired"""
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expiry, value = entry
+            if time.monotonic() >= expiry:
+                del self._entries[key]
+                return None
+            return value
+
+    async def set(self, key, value) -> None:
+        # Don't cache empty/fallback results
+        if not value:
+            return
+        async with self._lock:
+            if key not in self._entries and len(self._entries) >= self.maxsize:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
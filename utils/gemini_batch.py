@@ -0,0 +1,124 @@
+"""
+Micro-batching dispatcher for Gemini calls
+Coalesces prompts submitted close together into one flush so concurrent
+agents share a single dispatch instead of issuing scattered one-off calls
+"""
+
+import asyncio
+import logging
+
+from utils.llm_cache import get_llm_semaphore
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = 0.05
+MAX_BATCH_SIZE = 16
+
+
+class GeminiBatcher:
+    """
+    Collects (prompt, future) pairs and flushes them together
+
+    Prompts wait at most the flush interval (or until the batch fills)
+    before the whole batch is dispatched concurrently through one client.
+    Realtime paths can pass urgent=True to skip batching entirely.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        max_batch_size: int = MAX_BATCH_SIZE
+    ):
+        self.client = client
+        self.model = model
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._pending = []  # list of (contents, config, future)
+        self._flush_task = None
+        # Strong references to in-flight flush tasks - the loop only
+        # keeps weak refs, and a GC'd flush would strand parked futures
+        self._flush_tasks = set()
+
+    async def submit(self, contents: str, config=None, urgent: bool = False) -> str:
+        """
+        Submit a prompt for batched dispatch
+
+        Args:
+            contents: Prompt text
+            config: Optional generate_content config dict
+            urgent: Bypass batching for latency-critical paths
+
+        Returns:
+            Response text
+        """
+        if urgent:
+            return await self._generate(contents, config)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((contents, config, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._schedule_flush()
+        elif self._flush_task is None:
+            self._flush_task = self._track(self._flush_after_delay())
+
+        return await future
+
+    def _track(self, coro) -> asyncio.Task:
+        """Create a task and hold it until done"""
+        task = asyncio.create_task(coro)
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+        return task
+
+    def _schedule_flush(self):
+        """Flush immediately (batch is full)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._track(self._flush())
+
+    async def _flush_after_delay(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        logger.debug(f"Flushing Gemini batch of {len(batch)} prompts")
+
+        results = await asyncio.gather(
+            *(self._generate(contents, config) for contents, config, _ in batch),
+            return_exceptions=True
+        )
+
+        for (_, _, future), result in zip(batch, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _generate(self, contents: str, config=None) -> str:
+        # Same in-flight cap as the direct cache path - a full batch is
+        # still at most MAX_CONCURRENT_LLM concurrent requests
+        async with get_llm_semaphore():
+            if config is not None:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=contents,
+                    config=config
+                )
+            else:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=contents
+                )
+            return response.text
@@ -0,0 +1,345 @@
+"""
+Semantic response cache for Gemini calls
+Returns stored completions for repeated or near-duplicate prompts
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import shelve
+import time
+
+logger = logging.getLogger(__name__)
+
+# Shared JSON helpers - the optional-orjson fallback policy lives here
+# instead of being copy-pasted into every agent and tool module
+try:
+    import orjson
+
+    json_loads = orjson.loads  # 2-5x faster than stdlib on LLM output
+
+    def json_dumps(obj) -> str:
+        """Compact JSON text"""
+        return orjson.dumps(obj).decode()
+
+    def json_dumps_bytes(obj) -> bytes:
+        """Compact JSON bytes (orjson's native output)"""
+        return orjson.dumps(obj)
+
+    def json_dumps_pretty(obj) -> str:
+        """Indented JSON text for debug dumps"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj) -> str:
+        """Compact JSON text"""
+        return json.dumps(obj, separators=(',', ':'))
+
+    def json_dumps_bytes(obj) -> bytes:
+        """Compact JSON bytes"""
+        return json.dumps(obj).encode()
+
+    def json_dumps_pretty(obj) -> str:
+        """Indented JSON text for debug dumps"""
+        return json.dumps(obj, indent=2)
+
+EMBEDDING_MODEL = "text-embedding-004"
+SIMILARITY_THRESHOLD = 0.95
+
+# Both tiers hold full prompts (patient symptom text included), so they
+# are bounded and expire like the tool caches instead of growing for the
+# life of a long-running worker
+EXACT_CACHE_MAX = 1024
+SEMANTIC_CACHE_MAX = 256
+CACHE_TTL_SECONDS = 3600
+
+# Optional micro-batching dispatcher (see utils/gemini_batch.py)
+_batcher = None
+
+# Concurrency cap on outbound generate_content calls, decoupled from the
+# token-bucket pacing - bounds in-flight requests so wide gathers can't
+# exhaust connections or pile up head-of-line 429 retries
+_llm_semaphore = None
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """Shared semaphore every outbound LLM dispatch must hold
+
+    Built lazily so importing this module never requires a running loop.
+    The batcher and the streaming call sites acquire it too - the cap
+    covers all generate_content traffic, not just the direct cache path.
+    """
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        from config import Config
+        _llm_semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_LLM)
+    return _llm_semaphore
+
+
+def configure_batcher(batcher) -> None:
+    """Route cache misses through a GeminiBatcher instead of one-off calls"""
+    global _batcher
+    _batcher = batcher
+
+
+def cosine_similarity(a, b) -> float:
+    """Cosine similarity between two embedding vectors"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+try:
+    import numpy as np
+    from numba import njit, prange
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _cosine_scores(q, M):
+        n = M.shape[0]
+        out = np.empty(n, dtype=np.float32)
+        q_norm = np.sqrt((q * q).sum())
+        for i in prange(n):
+            dot = 0.0
+            row_norm = 0.0
+            for j in range(q.shape[0]):
+                dot += q[j] * M[i, j]
+                row_norm += M[i, j] * M[i, j]
+            denom = q_norm * math.sqrt(row_norm)
+            out[i] = dot / denom if denom > 0 else 0.0
+        return out
+
+    def topk_cosine(query, vectors, k):
+        """Top-k most similar vectors via a JIT-compiled batched kernel
+
+        Returns list of (index, score) sorted by descending similarity.
+        """
+        q = np.asarray(query, dtype=np.float32)
+        M = np.asarray(vectors, dtype=np.float32)
+        scores = _cosine_scores(q, M)
+        order = np.argsort(scores)[::-1][:k]
+        return [(int(i), float(scores[i])) for i in order]
+
+except ImportError:
+    def topk_cosine(query, vectors, k):
+        """Top-k most similar vectors (pure-Python fallback)
+
+        Returns list of (index, score) sorted by descending similarity.
+        """
+        scored = sorted(
+            ((i, cosine_similarity(query, v)) for i, v in enumerate(vectors)),
+            key=lambda pair: pair[1],
+            reverse=True
+        )
+        return scored[:k]
+
+
+class SemanticLLMCache:
+    """
+    Two-level cache for LLM completions:
+    1. Exact-match fast path keyed on a hash of (model, prompt, config)
+    2. Semantic match on prompt embeddings with cosine similarity
+
+    Both tiers are bounded (insertion-order FIFO eviction) and entries
+    expire after ttl_seconds, like AsyncTTLCache.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+        maxsize: int = EXACT_CACHE_MAX,
+        semantic_maxsize: int = SEMANTIC_CACHE_MAX,
+        ttl_seconds: float = CACHE_TTL_SECONDS
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.maxsize = maxsize
+        self.semantic_maxsize = semantic_maxsize
+        self.ttl_seconds = ttl_seconds
+        self.exact_cache = {}     # prompt hash -> (expiry, response text)
+        # Semantic entries are bucketed per (model, config repr) so a
+        # near-duplicate prompt can never return text generated under a
+        # different model, tool set, or response schema
+        self.semantic_cache = {}  # (model, config repr) -> [(expiry, embedding, text)]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _hash_prompt(model: str, contents: str, config) -> str:
+        key = f"{model}|{contents}|{config}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    async def _embed(self, client, contents: str):
+        """Embed a prompt; returns None if the embedding call fails"""
+        try:
+            result = await client.aio.models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=contents
+            )
+            return result.embeddings[0].values
+        except Exception as e:
+            logger.debug(f"Embedding failed, skipping semantic cache: {e}")
+            return None
+
+    def _get_exact(self, key):
+        """Return the exact-tier text for this key, or None if missing/expired"""
+        entry = self.exact_cache.get(key)
+        if entry is None:
+            return None
+        expiry, text = entry
+        if time.monotonic() >= expiry:
+            del self.exact_cache[key]
+            return None
+        return text
+
+    def _store_exact(self, key: str, text: str) -> None:
+        if key not in self.exact_cache and len(self.exact_cache) >= self.maxsize:
+            self.exact_cache.pop(next(iter(self.exact_cache)))
+        self.exact_cache[key] = (time.monotonic() + self.ttl_seconds, text)
+
+    def _find_similar(self, group_key, embedding):
+        """Return the cached text of the most similar prompt, if close enough"""
+        entries = self.semantic_cache.get(group_key)
+        if not entries:
+            return None
+
+        # Constant TTL means insertion order is expiry order, so expired
+        # entries form a prefix - drop it before matching
+        now = time.monotonic()
+        while entries and now >= entries[0][0]:
+            entries.pop(0)
+        if not entries:
+            del self.semantic_cache[group_key]
+            return None
+
+        top = topk_cosine(embedding, [vec for _, vec, _ in entries], 1)
+        if top and top[0][1] >= self.similarity_threshold:
+            return entries[top[0][0]][2]
+        return None
+
+    async def get_or_generate(
+        self, client, model: str, contents: str, config=None,
+        semantic: bool = True, urgent: bool = False
+    ) -> str:
+        """
+        Return a cached completion for this prompt, or call Gemini and cache
+
+        Args:
+            client: genai.Client instance
+            model: Model name (e.g., Config.MODEL_NAME)
+            contents: Prompt text
+            config: Optional generate_content config dict
+            semantic: Allow near-duplicate embedding matches. Pass False
+                for prompts where a small textual difference changes the
+                right answer (e.g. grounded searches that differ only in
+                condition or location) - those use the exact tier only.
+            urgent: Skip micro-batching on a cache miss so latency-critical
+                calls never wait out the flush window.
+
+        Returns:
+            Response text
+        """
+
+        # Level 1: exact-match fast path (no embedding call needed)
+        key = self._hash_prompt(model, contents, config)
+        cached_text = self._get_exact(key)
+        if cached_text is not None:
+            self.hits += 1
+            return cached_text
+
+        # Level 2: semantic match on prompt embedding, scoped to this
+        # model+config so entries never leak across call shapes
+        embedding = None
+        if semantic:
+            group_key = (model, str(config))
+            embedding = await self._embed(client, contents)
+            if embedding is not None:
+                cached_text = self._find_similar(group_key, embedding)
+                if cached_text is not None:
+                    self.hits += 1
+                    self._store_exact(key, cached_text)
+                    return cached_text
+
+        # Miss: call the model and store the result
+        self.misses += 1
+        text = await self._generate(client, model, contents, config, urgent)
+        self._store_exact(key, text)
+        if embedding is not None:
+            bucket = self.semantic_cache.setdefault(group_key, [])
+            if len(bucket) >= self.semantic_maxsize:
+                bucket.pop(0)
+            bucket.append((time.monotonic() + self.ttl_seconds, embedding, text))
+
+        return text
+
+    @staticmethod
+    async def _generate(client, model: str, contents: str, config=None, urgent: bool = False) -> str:
+        """Dispatch an uncached prompt, through the batcher when configured"""
+        if _batcher is not None and _batcher.model == model:
+            return await _batcher.submit(contents, config=config, urgent=urgent)
+
+        async with get_llm_semaphore():
+            if config is not None:
+                response = await client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+            else:
+                response = await client.aio.models.generate_content(
+                    model=model,
+                    contents=contents
+                )
+            return response.text
+
+
+class PromptKVCache:
+    """
+    Exact-match key-value cache for repetitive prompt inputs,
+    persisted on disk via shelve so hits survive restarts
+    """
+
+    def __init__(self, filename: str = 'rarepath_prompt_cache'):
+        self.filename = filename
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Build a stable cache key from the prompt's inputs"""
+        joined = ",".join(str(p) for p in parts)
+        return hashlib.sha1(joined.encode()).hexdigest()
+
+    def get(self, key: str):
+        try:
+            with shelve.open(self.filename) as db:
+                return db.get(key)
+        except Exception as e:
+            logger.debug(f"Prompt cache read failed: {e}")
+            return None
+
+    def set(self, key: str, value) -> None:
+        # Don't cache empty/fallback responses
+        if not value:
+            return
+        try:
+            with shelve.open(self.filename) as db:
+                db[key] = value
+        except Exception as e:
+            logger.debug(f"Prompt cache write failed: {e}")
+
+
+# Shared cache instance used across agents
+_cache = SemanticLLMCache()
+
+
+async def cached_generate(
+    client, model: str, contents: str, config=None,
+    semantic: bool = True, urgent: bool = False
+) -> str:
+    """Generate content through the shared semantic cache"""
+    return await _cache.get_or_generate(
+        client, model, contents, config, semantic=semantic, urgent=urgent
+    )
@@ -1,42 +1,83 @@
 
+import atexit
 import logging
+import logging.handlers
+import queue
 from datetime import datetime
 from typing import Dict, Any
-import json
+
+from config import Config
+from utils.llm_cache import json_dumps_pretty as _dumps_pretty
+
+
+class _LazyJSON:
+    """Defers JSON serialization until the log record is formatted"""
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __str__(self):
+        return _dumps_pretty(self._data)
 
 class RarePathLogger:
     """Custom logger for RarePath AI with observability"""
-    
+
     def __init__(self, name: str = "rarepath"):
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.INFO)
-        
-        # Console handler
+        self.logger.setLevel(logging.DEBUG)
+
+        # Console handler - DEBUG output gated on Config.DEBUG
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        
+        console_handler.setLevel(logging.DEBUG if Config.DEBUG else logging.INFO)
+
         # File handler
         file_handler = logging.FileHandler('rarepath.log')
         file_handler.setLevel(logging.DEBUG)
-        
+
         # Formatter
         formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
         console_handler.setFormatter(formatter)
         file_handler.setFormatter(formatter)
-        
-        self.logger.addHandler(console_handler)
-        self.logger.addHandler(file_handler)
-        
-        # Metrics storage
+
+        # Records go through a queue to a background listener thread, so
+        # logging never does synchronous I/O on the event loop
+        self._log_queue = queue.Queue(-1)
+        self.logger.addHandler(logging.handlers.QueueHandler(self._log_queue))
+        self.listener = logging.handlers.QueueListener(
+            self._log_queue, console_handler, file_handler,
+            respect_handler_level=True
+        )
+        self.listener.start()
+        # Flush queued records before interpreter shutdown
+        atexit.register(self.listener.stop)
+
+        # Metrics storage - running sums, not per-call lists, so memory
+        # stays bounded and get_metrics() is constant-time
         self.metrics = {
             'agent_calls': {},
-            'api_calls': {},
-            'errors': [],
-            'response_times': []
+            'errors': []
         }
-    
+        self._rt_sum = 0.0
+        self._rt_count = 0
+        self._api_sum = {}    # api_name -> total response time
+        self._api_count = {}  # api_name -> call count
+
+    def info(self, message: str):
+        """Log a progress message"""
+        self.logger.info(message)
+
+    def debug(self, message: str):
+        """Log a debug message (shown only when Config.DEBUG is set)"""
+        self.logger.debug(message)
+
+    def warning(self, message: str):
+        """Log a warning message"""
+        self.logger.warning(message)
+
     def log_agent_call(self, agent_name: str, action: str, data: Dict = None):
         """Log agent activity"""
         self.logger.info(f"Agent: {agent_name} | Action: {action}")
@@ -45,18 +86,19 @@ class RarePathLogger:
             self.metrics['agent_calls'][agent_name] = 0
         self.metrics['agent_calls'][agent_name] += 1
         
-        if data:
-            self.logger.debug(f"Data: {json.dumps(data, indent=2)}")
+        # Serialize only when debug output is actually wanted - the dump
+        # is pure overhead on every agent call otherwise
+        if data and Config.DEBUG:
+            self.logger.debug("Data: %s", _LazyJSON(data))
     
     def log_api_call(self, api_name: str, endpoint: str, response_time: float):
         """Log API calls"""
         self.logger.info(f"API: {api_name} | Endpoint: {endpoint} | Time: {response_time:.2f}s")
         
-        if api_name not in self.metrics['api_calls']:
-            self.metrics['api_calls'][api_name] = []
-        
-        self.metrics['api_calls'][api_name].append(response_time)
-        self.metrics['response_times'].append(response_time)
+        self._rt_sum += response_time
+        self._rt_count += 1
+        self._api_sum[api_name] = self._api_sum.get(api_name, 0.0) + response_time
+        self._api_count[api_name] = self._api_count.get(api_name, 0) + 1
     
     def log_error(self, error: Exception, context: str = ""):
         """Log errors"""
@@ -69,15 +111,12 @@ class RarePathLogger:
     
     def get_metrics(self) -> Dict:
         """Get aggregated metrics"""
-        avg_response_time = (
-            sum(self.metrics['response_times']) / len(self.metrics['response_times'])
-            if self.metrics['response_times'] else 0
-        )
-        
+        avg_response_time = self._rt_sum / self._rt_count if self._rt_count else 0
+
         return {
             'total_agent_calls': sum(self.metrics['agent_calls'].values()),
             'agent_breakdown': self.metrics['agent_calls'],
-            'total_api_calls': sum(len(v) for v in self.metrics['api_calls'].values()),
+            'total_api_calls': sum(self._api_count.values()),
             'avg_response_time': avg_response_time,
             'total_errors': len(self.metrics['errors'])
         }
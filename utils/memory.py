@@ -1,27 +1,120 @@
 from typing import Dict, List, Any
-import json
+import asyncio
+import logging
+import time
 from datetime import datetime
 
+from utils.llm_cache import json_dumps_bytes as _json_dumps
+
+logger = logging.getLogger("rarepath.utils.memory")
+
+try:
+    # Optional persistence backend; the in-process dict stays the
+    # source of truth and everything works without it
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+DB_PATH = 'rarepath_memory.db'
+
+_db = None
+_db_lock = asyncio.Lock()
+
+
+async def _get_db():
+    """Module-scope aiosqlite connection in WAL mode, opened lazily"""
+    global _db
+    if _db is None:
+        async with _db_lock:
+            if _db is None:
+                db = await aiosqlite.connect(DB_PATH)
+                await db.execute('PRAGMA journal_mode=WAL')
+                await db.execute('PRAGMA synchronous=NORMAL')
+                await db.execute(
+                    'CREATE TABLE IF NOT EXISTS events('
+                    'session_id TEXT, ts REAL, kind TEXT, data BLOB)'
+                )
+                await db.execute(
+                    'CREATE INDEX IF NOT EXISTS ix_events_sid '
+                    'ON events(session_id)'
+                )
+                await db.commit()
+                _db = db
+    return _db
+
+
+async def aclose():
+    """Close the persistence connection on shutdown"""
+    global _db
+    if _db is not None:
+        await _db.close()
+        _db = None
+
 class MemoryBank:
     """
     Long-term memory storage for patient diagnostic journeys
     """
     
     def __init__(self):
-        self.storage = {}  # In production, use persistent storage
+        self.storage = {}
+        self._pending_writes = set()  # keeps write-behind tasks alive
     
     def store_session(self, session_id: str, data: Dict) -> None:
         """Store session data"""
         if session_id not in self.storage:
             self.storage[session_id] = {
                 'created_at': datetime.now().isoformat(),
-                'history': []
+                'history': [],
+                # Incremental projections so reads never re-scan history
+                'symptoms_timeline': [],
+                'conditions_set': set()
             }
-        
-        self.storage[session_id]['history'].append({
+
+        session = self.storage[session_id]
+        session['history'].append({
             'timestamp': datetime.now().isoformat(),
             'data': data
         })
+
+        if 'symptoms' in data:
+            session['symptoms_timeline'].append(data['symptoms'])
+        if 'conditions' in data:
+            session['conditions_set'].update(
+                c.get('name', '') for c in data['conditions']
+            )
+
+        self._persist(session_id, data)
+
+    def _persist(self, session_id: str, data: Dict) -> None:
+        """Schedule a write-behind insert when aiosqlite is available
+
+        Runs off the caller's critical path: the event row is inserted
+        by a background task, and failures never touch in-memory state.
+        """
+        if aiosqlite is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # sync caller outside the event loop - memory only
+
+        task = loop.create_task(self._write_event(
+            session_id, time.time(), ','.join(sorted(data)), _json_dumps(data)
+        ))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    @staticmethod
+    async def _write_event(session_id: str, ts: float, kind: str, blob: bytes) -> None:
+        try:
+            db = await _get_db()
+            await db.execute(
+                'INSERT INTO events VALUES (?, ?, ?, ?)',
+                (session_id, ts, kind, blob)
+            )
+            await db.commit()
+        except Exception as e:
+            logger.warning(f"Error persisting session event: {e}")
     
     def retrieve_session(self, session_id: str) -> Dict:
         """Retrieve session data"""
@@ -29,26 +122,11 @@ class MemoryBank:
     
     def get_symptom_evolution(self, session_id: str) -> List[Dict]:
         """Get how symptoms have evolved over time"""
-        session = self.retrieve_session(session_id)
-        return [
-            entry['data'].get('symptoms', {})
-            for entry in session.get('history', [])
-            if 'symptoms' in entry['data']
-        ]
+        return self.retrieve_session(session_id).get('symptoms_timeline', [])
     
     def get_search_history(self, session_id: str) -> List[str]:
         """Get history of conditions searched"""
-        session = self.retrieve_session(session_id)
-        conditions = []
-        
-        for entry in session.get('history', []):
-            if 'conditions' in entry['data']:
-                conditions.extend([
-                    c.get('name', '') 
-                    for c in entry['data']['conditions']
-                ])
-        
-        return list(set(conditions))  # Unique conditions
+        return list(self.retrieve_session(session_id).get('conditions_set', ()))
 
 class SessionManager:
     """Manages active sessions"""
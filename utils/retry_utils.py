@@ -4,13 +4,37 @@ Handles rate limiting and transient errors
 """
 
 import asyncio
+import collections
 import functools
+import random
+import re
+import textwrap
 import time
-from typing import Callable, Any
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Any, Optional, ParamSpec, TypeVar
 import logging
 
+try:
+    # Lets the classifier recognize transport-level failures from the
+    # HTTP tools without making httpx a hard dependency of utils
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    # Typed Gemini errors carry the HTTP status on .code
+    from google.genai import errors as genai_errors
+except ImportError:
+    genai_errors = None
+
 logger = logging.getLogger(__name__)
 
+# Single C-level scan for providers that wrap transient errors in plain
+# strings; word boundaries keep '500' inside a longer identifier from
+# matching
+_RETRIABLE_RE = re.compile(r'\b(?:429|500|503|RESOURCE_EXHAUSTED|UNAVAILABLE|INTERNAL)\b')
+
 
 class RetryConfig:
     """Configuration for retry behavior"""
@@ -18,99 +42,453 @@ class RetryConfig:
     INITIAL_DELAY = 2.0  # seconds
     MAX_DELAY = 60.0  # seconds
     BACKOFF_MULTIPLIER = 2.0
-    RETRY_STATUS_CODES = [429, 503, 500]  # Rate limit, service unavailable, internal error
+    RETRY_STATUS_CODES = frozenset({429, 503, 500})  # Rate limit, service unavailable, internal error
+    # Exception types retryable on sight, grown by the optional imports
+    # above - the type-based fast path for classifiers
+    RETRIABLE_EXCEPTIONS = tuple(
+        t for t in (
+            TimeoutError,
+            httpx.TransportError if httpx is not None else None,
+        ) if t is not None
+    )
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """True for rate-limit and transient server errors worth retrying
+
+    Classifies by exception class and status code rather than scanning
+    str(exc): stringifying can materialize whole response bodies, and a
+    body that merely mentions "500" used to burn retry budget on
+    permanent failures.
+    """
+    if isinstance(exc, RetryConfig.RETRIABLE_EXCEPTIONS):
+        return True  # timeouts, connection resets, TLS hiccups
+    if httpx is not None and isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RetryConfig.RETRY_STATUS_CODES
+    if genai_errors is not None and isinstance(exc, genai_errors.APIError):
+        return exc.code in RetryConfig.RETRY_STATUS_CODES
+    # Other wrappers that expose a numeric status
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'code', None)
+    if isinstance(status, int):
+        return status in RetryConfig.RETRY_STATUS_CODES
+    # Last resort for errors that only carry a message
+    return _RETRIABLE_RE.search(str(exc)) is not None
+
+
+def _extract_retry_after(exc: BaseException) -> Optional[float]:
+    """Pull the server-requested retry delay out of an exception, if any
+
+    Checks the structured retry_delay that google-api-core attaches to
+    ResourceExhausted, then the HTTP Retry-After header (either delta
+    seconds or an HTTP-date) on httpx-style errors.
+    """
+    retry_delay = getattr(exc, 'retry_delay', None)
+    if retry_delay is not None:
+        return (getattr(retry_delay, 'seconds', 0)
+                + getattr(retry_delay, 'nanos', 0) / 1e9)
+
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    raw = headers.get('Retry-After')
+    if not raw:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        pass
+    try:
+        target = parsedate_to_datetime(raw)
+        return max(0.0, (target - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
 
 
-def async_retry_with_backoff(
-    max_retries: int = RetryConfig.MAX_RETRIES,
-    initial_delay: float = RetryConfig.INITIAL_DELAY,
-    max_delay: float = RetryConfig.MAX_DELAY,
-    backoff_multiplier: float = RetryConfig.BACKOFF_MULTIPLIER
-):
+P = ParamSpec('P')
+R = TypeVar('R')
+
+
+class AsyncRetry:
     """
-    Decorator for async functions that implements exponential backoff retry logic
-    
+    Retry decorator with exponential backoff for async functions
+
+    Class-based so the configuration lives in slots rather than a fresh
+    set of closure cells per decoration, and so the per-attempt loop
+    can run on hoisted locals instead of repeated global lookups.
+
     Args:
         max_retries: Maximum number of retry attempts
         initial_delay: Initial delay in seconds before first retry
         max_delay: Maximum delay between retries
         backoff_multiplier: Multiplier for exponential backoff
-    
+        pace: Draw a token from the shared LLM limiter before each
+            attempt (disable for non-Gemini endpoints with their own
+            rate rules)
+        jitter_mode: "full" (AWS full jitter, the default),
+            "decorrelated", or "none". Randomized delays keep
+            concurrent callers that failed together from waking and
+            retrying in lockstep against the same endpoint.
+
     Usage:
-        @async_retry_with_backoff(max_retries=3)
+        @AsyncRetry(max_retries=3)
         async def my_api_call():
             return await client.generate_content(...)
     """
-    def decorator(func: Callable) -> Callable:
+
+    __slots__ = ('max_retries', 'initial_delay', 'max_delay',
+                 'backoff_multiplier', 'pace', 'jitter_mode')
+
+    def __init__(
+        self,
+        max_retries: int = RetryConfig.MAX_RETRIES,
+        initial_delay: float = RetryConfig.INITIAL_DELAY,
+        max_delay: float = RetryConfig.MAX_DELAY,
+        backoff_multiplier: float = RetryConfig.BACKOFF_MULTIPLIER,
+        pace: bool = True,
+        jitter_mode: str = "full"
+    ):
+        # Fail fast on configs that could never terminate sensibly
+        assert backoff_multiplier >= 1.0, "backoff_multiplier must be >= 1.0"
+        assert max_delay >= initial_delay, "max_delay must be >= initial_delay"
+        self.max_retries = max_retries
+        self.initial_delay = min(initial_delay, max_delay)
+        self.max_delay = max_delay
+        self.backoff_multiplier = backoff_multiplier
+        self.pace = pace
+        self.jitter_mode = jitter_mode
+
+    def __call__(self, func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        if self.max_retries <= 0:
+            # No retries wanted: skip the loop, the try frame, and the
+            # classifier entirely
+            if not self.pace:
+                return func
+
+            @functools.wraps(func)
+            async def paced(*args: P.args, **kwargs: P.kwargs) -> R:
+                await get_default_limiter().acquire()
+                return await func(*args, **kwargs)
+
+            return paced
+
+        # Bind everything the attempt loop touches to locals once, at
+        # decoration time - LOAD_FAST in the loop instead of LOAD_GLOBAL
+        max_retries = self.max_retries
+        initial_delay = self.initial_delay
+        max_delay = self.max_delay
+        backoff_multiplier = self.backoff_multiplier
+        pace = self.pace
+        jitter_mode = self.jitter_mode
+        _sleep = asyncio.sleep
+        _uniform = random.uniform
+        _min = min
+        _retryable = is_retryable_error
+        _retry_after = _extract_retry_after
+        _shorten = textwrap.shorten
+        # The whole backoff schedule is known at decoration time, so
+        # precompute it once - the loop body indexes a tuple instead of
+        # redoing the multiply/clamp per attempt (decorrelated jitter
+        # stays dynamic: each draw depends on the previous one)
+        _delays = tuple(
+            _min(initial_delay * backoff_multiplier ** i, max_delay)
+            for i in range(max_retries)
+        )
+
         @functools.wraps(func)
-        async def wrapper(*args, **kwargs) -> Any:
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
             delay = initial_delay
-            last_exception = None
-            
+
             for attempt in range(max_retries + 1):
                 try:
+                    if pace:
+                        # Pace proactively against the shared budget so bursts
+                        # of parallel calls don't trigger 429 backoff cascades
+                        await get_default_limiter().acquire()
                     return await func(*args, **kwargs)
-                    
+
+                except asyncio.CancelledError:
+                    # Cancellation must win immediately - classifying it
+                    # or sleeping out the backoff would stretch shutdown
+                    # by the sum of remaining delays
+                    raise
                 except Exception as e:
-                    last_exception = e
-                    error_msg = str(e)
-                    
-                    # Check if this is a retriable error
-                    is_rate_limit = '429' in error_msg or 'RESOURCE_EXHAUSTED' in error_msg
-                    is_server_error = '503' in error_msg or '500' in error_msg
-                    
-                    if not (is_rate_limit or is_server_error):
+                    if not _retryable(e):
                         # Not a retriable error, raise immediately
-                        logger.error(f"Non-retriable error in {func.__name__}: {error_msg}")
+                        logger.error("Non-retriable error in %s: %s", func.__name__, e)
                         raise
-                    
-                    if attempt < max_retries:
-                        # Calculate delay with jitter
-                        jitter = delay * 0.1  # 10% jitter
-                        actual_delay = min(delay + jitter, max_delay)
-                        
-                        logger.warning(
-                            f"Attempt {attempt + 1}/{max_retries} failed for {func.__name__}. "
-                            f"Retrying in {actual_delay:.2f}s. Error: {error_msg[:100]}"
+
+                    if attempt == max_retries:
+                        # Re-raise in place: the original traceback is
+                        # kept, and the exception (often carrying a full
+                        # response object) is never held across sleeps
+                        logger.error(
+                            "All %d retry attempts failed for %s. Final error: %s",
+                            max_retries, func.__name__, _shorten(str(e), 100)
                         )
-                        
-                        await asyncio.sleep(actual_delay)
-                        delay *= backoff_multiplier
+                        raise
+
+                    if jitter_mode == "full":
+                        # AWS full jitter: anywhere in [0, base delay]
+                        actual_delay = _uniform(0, _delays[attempt])
+                    elif jitter_mode == "decorrelated":
+                        # Growth is embedded in the draw itself
+                        delay = _min(max_delay, _uniform(initial_delay, delay * 3))
+                        actual_delay = delay
                     else:
-                        logger.error(
-                            f"All {max_retries} retry attempts failed for {func.__name__}. "
-                            f"Final error: {error_msg[:100]}"
+                        actual_delay = _delays[attempt]
+
+                    # A server hint (Retry-After / RetryInfo) knows the
+                    # actual quota-recovery window; never retry before it
+                    hint = _retry_after(e)
+                    if hint:
+                        actual_delay = max(actual_delay, hint)
+
+                    if pace:
+                        # Fold the limiter's wait into the backoff
+                        # sleep so the retry costs one scheduler
+                        # round-trip, not two - by the time the next
+                        # attempt acquires, a token is ready
+                        token_wait = (get_default_limiter().next_available_at()
+                                      - time.monotonic())
+                        if token_wait > actual_delay:
+                            actual_delay = token_wait
+
+                    # str(e) can carry a multi-KB response body;
+                    # skip the conversion entirely when warnings
+                    # aren't being emitted
+                    if logger.isEnabledFor(logging.WARNING):
+                        logger.warning(
+                            "Attempt %d/%d failed for %s. Retrying in %.2fs. Error: %s",
+                            attempt + 1, max_retries, func.__name__,
+                            actual_delay, _shorten(str(e), 100)
                         )
-            
-            # All retries exhausted
-            raise last_exception
-        
+
+                # The except block has ended here, so the failed
+                # attempt's exception is released before the wait begins
+                await _sleep(actual_delay)
+
         return wrapper
-    return decorator
 
 
-class RateLimiter:
-    """Simple rate limiter to prevent API quota exhaustion"""
-    
-    def __init__(self, calls_per_minute: int = 15):
+def async_retry_with_backoff(**kwargs) -> AsyncRetry:
+    """Backwards-compatible factory for the existing decorator call sites"""
+    return AsyncRetry(**kwargs)
+
+
+class AsyncTokenBucket:
+    """
+    Token-bucket rate limiter with a concurrency cap
+
+    Tokens refill continuously at the per-minute rate, so short bursts can
+    proceed without the fixed inter-call pacing of the old limiter, while
+    a semaphore bounds in-flight calls so parallel agents can't stampede
+    the API into 429 backoff cascades.
+    """
+
+    def __init__(self, calls_per_minute: int = 15, max_concurrency: int = 4,
+                 burst: int = None):
         """
         Initialize rate limiter
-        
+
         Args:
-            calls_per_minute: Maximum number of calls allowed per minute
+            calls_per_minute: Sustained call budget per minute
+            max_concurrency: Maximum number of in-flight calls
+            burst: Bucket capacity; defaults to a full minute's budget.
+                Pass a small value for APIs with per-second limits so a
+                fresh bucket can't front-load a minute of calls at once.
         """
         self.calls_per_minute = calls_per_minute
-        self.min_interval = 60.0 / calls_per_minute  # seconds between calls
-        self.last_call_time = 0.0
-    
+        self.rate = calls_per_minute / 60.0  # tokens per second
+        self.capacity = float(burst if burst is not None else calls_per_minute)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def next_available_at(self) -> float:
+        """Monotonic timestamp at which a token will be available
+
+        A hint only - nothing is consumed - so a caller about to sleep
+        anyway (e.g. retry backoff) can size one sleep to cover both
+        waits instead of scheduling two back to back.
+        """
+        self._refill()
+        now = time.monotonic()
+        if self.tokens >= 1.0:
+            return now
+        return now + (1.0 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait until a token is available (rate limit only)
+
+        The lock makes the refill/consume/sleep sequence atomic across
+        concurrent callers and keeps waiters FIFO - without it, every
+        waiter wakes at once, sees a fractional token, and the herd
+        collapses the limit to N calls per refill interval.
+        """
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait_time = (1.0 - self.tokens) / self.rate
+                logger.debug(f"Rate limiting: waiting {wait_time:.2f}s")
+                await asyncio.sleep(wait_time)
+
+    async def acquire_many(self, n: int):
+        """Reserve n tokens in one critical section
+
+        Fan-out callers that issue n calls back to back pay one lock
+        round-trip and at most one sleep for the whole batch, instead
+        of n of each. The bucket may go negative to book the deficit;
+        the sleep covers exactly the time to refill it.
+        """
+        if n <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            self.tokens -= n
+            if self.tokens < 0:
+                # Holding the lock keeps waiters FIFO
+                await asyncio.sleep(-self.tokens / self.rate)
+
+    async def __aenter__(self):
+        """Bound concurrency and rate together: async with limiter: ..."""
+        await self.semaphore.acquire()
+        try:
+            await self.acquire()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.semaphore.release()
+        return False
+
+
+class LeakyBucketRateLimiter:
+    """
+    Leaky-bucket rate limiter for APIs that reject bursts outright
+
+    Where the token bucket lets callers spend saved-up quota at once,
+    this smooths the send rate: the bucket drains at drip_rate per
+    second, each acquire adds one unit of fill, and a caller that would
+    overflow the burst capacity sleeps until enough has drained. Same
+    async acquire() surface as AsyncTokenBucket so call sites can swap.
+    """
+
+    def __init__(self, drip_rate: float, burst: int = 1):
+        """
+        Initialize rate limiter
+
+        Args:
+            drip_rate: Sustained calls per second
+            burst: Maximum fill level before callers start waiting
+        """
+        self.drip_rate = drip_rate
+        self.burst = float(burst)
+        self.level = 0.0
+        self.last_drip = time.monotonic()
+        self._lock = asyncio.Lock()
+
     async def acquire(self):
-        """Wait if necessary to respect rate limit"""
-        current_time = time.time()
-        time_since_last_call = current_time - self.last_call_time
-        
-        if time_since_last_call < self.min_interval:
-            wait_time = self.min_interval - time_since_last_call
-            logger.debug(f"Rate limiting: waiting {wait_time:.2f}s")
-            await asyncio.sleep(wait_time)
-        
-        self.last_call_time = time.time()
+        """Wait until the bucket has room, then add this call's fill"""
+        async with self._lock:
+            now = time.monotonic()
+            self.level = max(0.0, self.level - (now - self.last_drip) * self.drip_rate)
+            self.last_drip = now
+            if self.level + 1.0 > self.burst:
+                # Holding the lock keeps waiters FIFO
+                await asyncio.sleep((self.level + 1.0 - self.burst) / self.drip_rate)
+                self.last_drip = time.monotonic()
+                self.level = self.burst - 1.0
+            self.level += 1.0
+
+
+class SlidingWindowRateLimiter:
+    """
+    Rolling-window rate limiter for strict "N per 60s" caps
+
+    A token bucket can legally burst N calls at t=0 and N more at t=59,
+    peaking at 2N inside one rolling minute - exactly what
+    rolling-window quota checks reject. This tracks the timestamp of
+    each recent call in a deque and admits a new one only when fewer
+    than rpm fall inside the window, sleeping until the oldest ages
+    out. Same async acquire() surface as the other limiters.
+    """
+
+    def __init__(self, rpm: int, window: float = 60.0):
+        """
+        Initialize rate limiter
+
+        Args:
+            rpm: Maximum calls inside any rolling window
+            window: Window length in seconds
+        """
+        self.rpm = rpm
+        self.window = window
+        self._q = collections.deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a call is admissible inside the rolling window"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                cutoff = now - self.window
+                while self._q and self._q[0] <= cutoff:
+                    self._q.popleft()
+                if len(self._q) < self.rpm:
+                    self._q.append(now)
+                    return
+                # Holding the lock keeps waiters FIFO
+                await asyncio.sleep(self._q[0] + self.window - now)
+
+
+def make_limiter(algo: str = "token", **kwargs):
+    """Build a rate limiter by algorithm name
+
+    "token" allows bursts up to capacity (real quota semantics);
+    "leaky" smooths to a strict sustained rate for APIs that reject
+    bursts; "sliding" guarantees a hard cap inside any rolling window.
+    All share the async acquire() surface.
+    """
+    if algo == "token":
+        return AsyncTokenBucket(**kwargs)
+    if algo == "leaky":
+        return LeakyBucketRateLimiter(**kwargs)
+    if algo == "sliding":
+        return SlidingWindowRateLimiter(**kwargs)
+    raise ValueError(f"Unknown rate limiter algorithm: {algo}")
+
+
+# Backwards-compatible name used throughout the agents
+RateLimiter = AsyncTokenBucket
+
+
+_default_limiter = None
+
+
+def get_default_limiter() -> AsyncTokenBucket:
+    """Process-wide token bucket shared by all rate-limited call sites
+
+    Lazily built from Config so every decorator, agent, and the
+    orchestrator draw from one call budget instead of each pacing
+    independently (which would multiply the effective rate).
+    """
+    global _default_limiter
+    if _default_limiter is None:
+        from config import Config
+        _default_limiter = AsyncTokenBucket(
+            calls_per_minute=Config.RATE_LIMIT_CALLS_PER_MINUTE,
+            max_concurrency=Config.MAX_CONCURRENT_LLM
+        )
+    return _default_limiter